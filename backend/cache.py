@@ -0,0 +1,266 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+
+from backend import models, schemas
+from backend.config import settings
+from backend.rate_limit import get_redis
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class UserCache:
+    """Authenticated users by id: an in-process TTLCache in front of Redis.
+
+    Redis is only used while the app lifespan holds a connection, and any
+    Redis failure falls through to the caller's database lookup.
+
+    Users changed through the ORM are dropped locally at once and queued in
+    `stale` (see _user_changed); their Redis entries go on the next flush(),
+    which routes that change users await after committing, or before this
+    worker next reads or writes Redis.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.stale = set()
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    async def _drop_stale(self, redis):
+        """Delete the Redis entries of stale users, or raise RedisError."""
+        if self.stale:
+            users = list(self.stale)
+            await redis.delete(*(self._key(user_id) for user_id in users))
+            self.stale.difference_update(users)
+
+    async def get(self, user_id: int) -> Optional[schemas.UserOut]:
+        user = self.local.get(user_id)
+        if user is not None:
+            return user
+
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            await self._drop_stale(redis)
+            raw = await redis.get(self._key(user_id))
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+
+        user = schemas.UserOut.model_validate_json(raw)
+        self.local.set(user_id, user)
+        return user
+
+    async def set(self, user: schemas.UserOut):
+        self.local.set(user.id, user)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await self._drop_stale(redis)
+                await redis.set(self._key(user.id), user.model_dump_json(), ex=self.ttl)
+            except RedisError:
+                pass
+
+    async def invalidate(self, user_id: int):
+        self.local.delete(user_id)
+        self.stale.add(user_id)
+        await self.flush()
+
+    async def flush(self):
+        """Delete the Redis entries of users changed since the last flush."""
+        redis = get_redis()
+        if redis is None:
+            # No shared entries to drop.
+            self.stale.clear()
+            return
+        try:
+            await self._drop_stale(redis)
+        except RedisError:
+            pass
+
+
+class TaskListCache:
+    """Serialized GET /todos responses, per user and query parameters.
+
+    Entries are keyed on a per-user version token that every task write
+    replaces, so a write invalidates all of that user's pages at once.
+    Versions and pages live in Redis when the app holds a connection, with
+    an in-process TTLCache in front for pages. Without Redis versions are
+    kept in-process too, which only invalidates the current worker; pages
+    then rely on task_cache_ttl to age out elsewhere.
+
+    A bump that fails to reach Redis is remembered and retried, by deleting
+    the user's version key, before this worker next uses Redis. Until the
+    retry succeeds version() returns None, so the user's list is served
+    neither from nor into the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, version_ttl: int):
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.local_versions = TTLCache(maxsize, version_ttl)
+        self.unconfirmed = set()
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"todos:{user_id}:version"
+
+    @staticmethod
+    def _page_key(user_id: int, version: str, params: tuple) -> str:
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()
+        return f"todos:{user_id}:{version}:{digest}"
+
+    async def _retry_bumps(self, redis):
+        """Redo the bumps that failed, or raise RedisError."""
+        if self.unconfirmed:
+            users = list(self.unconfirmed)
+            await redis.delete(*(self._version_key(user_id) for user_id in users))
+            self.unconfirmed.difference_update(users)
+
+    @staticmethod
+    def shares_versions() -> bool:
+        """Whether versions come from Redis, and so change with every
+        worker's writes rather than only this one's.
+        """
+        return get_redis() is not None
+
+    async def version(self, user_id: int) -> Optional[str]:
+        """Current version token of a user's list, or None if unknown."""
+        redis = get_redis()
+        if redis is None:
+            version = self.local_versions.get(user_id)
+            if version is None:
+                version = uuid.uuid4().hex
+                self.local_versions.set(user_id, version)
+            return version
+
+        key = self._version_key(user_id)
+        try:
+            await self._retry_bumps(redis)
+            version = await redis.get(key)
+            if version is None:
+                await redis.set(key, uuid.uuid4().hex, nx=True, ex=self.version_ttl)
+                version = await redis.get(key)
+        except RedisError:
+            return None
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def bump(self, user_id: int):
+        """Invalidate every cached page of a user."""
+        self.local_versions.delete(user_id)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await self._retry_bumps(redis)
+                await redis.set(self._version_key(user_id), uuid.uuid4().hex,
+                                ex=self.version_ttl)
+            except RedisError:
+                self.unconfirmed.add(user_id)
+
+    async def get(self, user_id: int, version: str, params: tuple) -> Optional[bytes]:
+        key = self._page_key(user_id, version, params)
+        body = self.local.get(key)
+        if body is not None:
+            self.hits += 1
+            self.local_hits += 1
+            return body
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                body = await redis.get(key)
+            except RedisError:
+                body = None
+            if body is not None:
+                self.hits += 1
+                self.local.set(key, body)
+                return body
+
+        self.misses += 1
+        return None
+
+    async def set(self, user_id: int, version: str, params: tuple, body: bytes):
+        key = self._page_key(user_id, version, params)
+        self.local.set(key, body)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(key, body, ex=self.ttl)
+            except RedisError:
+                pass
+
+    def clear(self):
+        """Drop every local entry and reset the counters."""
+        self.local.clear()
+        self.local_versions.clear()
+        self.unconfirmed.clear()
+        self.hits = self.local_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "local_hits": self.local_hits, "misses": self.misses,
+                "unconfirmed_bumps": len(self.unconfirmed)}
+
+
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl)
+task_list_cache = TaskListCache(settings.task_cache_size, settings.task_cache_ttl,
+                                settings.task_cache_version_ttl)
+
+
+# ORM changes to a user drop the local entry straight away. Mapper events
+# cannot await, so the shared Redis entry is queued for user_cache.flush().
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    user_cache.local.delete(target.id)
+    user_cache.stale.add(target.id)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,9 +9,81 @@ class Settings(BaseSettings):
     database_password: str
     database_name: str
     database_username: str
+    database_url: Optional[str] = None
+    database_async: bool = False
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+    # Comma-separated read replica URLs, used by read-only routes. Each one
+    # gets a pool sized like the primary's.
+    database_replica_urls: str = ""
+    database_replica_check_seconds: float = 5
+    # After a client writes, its reads stay on the primary this long so it
+    # sees its own writes despite replication lag.
+    read_your_writes_seconds: float = 5
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
+    auth_stateless: bool = False
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 16
+    search_count_limit: int = 1000
+    bulk_max_items: int = 500
+    changes_max_items: int = 500
+    # Tombstones are purged this long after the delete, every
+    # TOMBSTONE_PURGE_SECONDS (0 disables); older change tokens get 410 Gone.
+    tombstone_retention_days: float = 30
+    tombstone_purge_seconds: float = 3600
+    tombstone_purge_batch_size: int = 1000
+    export_batch_size: int = 1000
+    import_batch_size: int = 5000
+    import_max_errors: int = 1000
+    user_cache_size: int = 10000
+    user_cache_ttl: int = 60
+    task_cache_enabled: bool = True
+    task_cache_size: int = 10000
+    task_cache_ttl: int = 30
+    # Idle users' version tokens expire after this; a new token only costs
+    # them their cached pages.
+    task_cache_version_ttl: int = 24 * 3600
+    environment: str = "test"
+    # Statements slower than this are logged to backend.slow_queries; 0 disables.
+    slow_query_seconds: float = 0.5
+    # Bearer token the /metrics routes require; they answer 404 while unset.
+    metrics_token: Optional[str] = None
+    # How often each worker shares its metrics through Redis for GET /metrics.
+    metrics_publish_seconds: float = 5
+    # Report per-request database and phase timings in a Server-Timing header.
+    server_timing: bool = False
+    redis_url: str = "redis://localhost:6379"
+    redis_max_connections: int = 50
+    # Seconds to wait for a free pooled connection, and for a command.
+    redis_pool_timeout: float = 0.1
+    redis_socket_timeout: float = 0.1
+    redis_connect_timeout: float = 0.5
+    redis_breaker_failures: int = 5
+    redis_breaker_reset_seconds: float = 10
+    # Token bucket budgets as "<requests>/<seconds>": a full bucket holds
+    # <requests> tokens and refills completely in <seconds>.
+    rate_limit_read: str = "120/60"
+    rate_limit_write: str = "60/60"
+    rate_limit_login: str = "10/60"
+    rate_limit_export: str = "2/60"
+    rate_limit_import: str = "2/60"
+    rate_limit_local_fraction: float = 0.0
+    rate_limit_local_sync_seconds: float = 1.0
+    # Production server, see backend.serve. 0 workers runs one per CPU core.
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0
+    server_backlog: int = 2048
+    server_keepalive_seconds: int = 5
+    server_limit_concurrency: Optional[int] = None
+    server_graceful_shutdown_seconds: int = 30
+    server_access_log: bool = False
 
     class ConfigDict:
         env_file = ".env"
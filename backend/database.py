@@ -1,13 +1,104 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anyio
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from backend import metrics
 from backend.config import settings
 
-SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+log = logging.getLogger("backend.database")
+
+SQLALCHEMY_DATABASE_URL = settings.database_url or f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def pool_options(url, poolclass):
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return dict(
+        poolclass=poolclass,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout,
+        pool_recycle=settings.database_pool_recycle,
+        pool_pre_ping=settings.database_pool_pre_ping,
+    )
+
+
+# Engines are created by init_engines() when the app starts rather than at
+# import time. They connect lazily, so starting does not need the database.
+engine = None
+async_engine = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = None
+replicas = None
+
+
+def replica_urls() -> list[str]:
+    return [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+
+
+def init_engines():
+    """Create the engines and bind the session factories to them.
+
+    Called from the app lifespan, and by scripts that drive the app without
+    one. Does nothing if the engines already exist.
+    """
+    global engine, async_engine, AsyncSessionLocal, replicas
+    if engine is not None:
+        return
+
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        **pool_options(SQLALCHEMY_DATABASE_URL, metrics.TimedQueuePool))
+    metrics.instrument_pool("sync", engine)
+    metrics.instrument_queries()
+    SessionLocal.configure(bind=engine)
+
+    if settings.database_async:
+        async_engine = create_async_engine(
+            to_async_url(SQLALCHEMY_DATABASE_URL),
+            **pool_options(SQLALCHEMY_DATABASE_URL, metrics.TimedAsyncAdaptedQueuePool))
+        metrics.instrument_pool("async", async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False)
 
+    urls = replica_urls()
+    if urls:
+        replicas = ReplicaSet([Replica(f"replica{i}", url) for i, url in enumerate(urls)])
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def dispose_engines():
+    """Close every pooled connection and forget the engines."""
+    global engine, async_engine, AsyncSessionLocal, replicas
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+    if replicas is not None:
+        await replicas.dispose()
+    engine = async_engine = AsyncSessionLocal = replicas = None
+    SessionLocal.configure(bind=None)
+    metrics.pools.clear()
+
 
 Base = declarative_base()
 
@@ -18,3 +109,239 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# One slot per pooled connection. A SyncSession takes a slot before its
+# first threadpool call and keeps it until closed, so threads only ever run
+# sessions that are guaranteed a connection. Without it, requests holding a
+# connection between calls can wait for a thread while every thread waits
+# for a connection.
+connection_slots = anyio.Semaphore(
+    settings.database_pool_size + settings.database_max_overflow)
+
+
+class SyncSession:
+    """Expose a sync Session through the subset of the AsyncSession API the
+    routers use, running each database call in the threadpool.
+    """
+
+    def __init__(self, session: Session, slots: anyio.Semaphore = None):
+        self.sync_session = session
+        self.slots = slots or connection_slots
+        self._holds_slot = False
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    async def _call(self, fn, *args, **kwargs):
+        if not self._holds_slot:
+            await self.slots.acquire()
+            self._holds_slot = True
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await self._call(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await self._call(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await self._call(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._call(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, **kwargs):
+        await self._call(self.sync_session.refresh, instance, **kwargs)
+
+    async def flush(self):
+        await self._call(self.sync_session.flush)
+
+    async def commit(self):
+        await self._call(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._call(self.sync_session.rollback)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._call(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        if not self._holds_slot:
+            return
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            self._holds_slot = False
+            self.slots.release()
+
+
+@asynccontextmanager
+async def _async_session(db: Session, async_factory, slots: anyio.Semaphore = None):
+    if async_factory is None:
+        session = SyncSession(db, slots)
+        try:
+            yield session
+        finally:
+            await session.close()
+    else:
+        async with async_factory() as session:
+            yield session
+
+
+async def get_async_db(db: Session = Depends(get_db)):
+    """Session dependency for the routers.
+
+    Yields an AsyncSession on the asyncpg/aiosqlite engine when
+    DATABASE_ASYNC is set, otherwise wraps the sync session from get_db.
+    Sessions are created lazily, so the unused one never connects.
+    """
+    async with _async_session(db, AsyncSessionLocal) as session:
+        yield session
+
+
+class Replica:
+    """A read replica: its engines, connection slots and health."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(url, **pool_options(url, metrics.TimedQueuePool))
+        self.async_engine = None
+        self.async_factory = None
+        if settings.database_async:
+            self.async_engine = create_async_engine(
+                to_async_url(url), **pool_options(url, metrics.TimedAsyncAdaptedQueuePool))
+            self.async_factory = async_sessionmaker(
+                self.async_engine, autoflush=False, expire_on_commit=False)
+        # Metrics follow the pool that serves the reads.
+        metrics.instrument_pool(
+            name, self.async_engine.sync_engine if self.async_engine else self.engine)
+        self.slots = anyio.Semaphore(settings.database_pool_size + settings.database_max_overflow)
+        self.healthy = True
+        self.failures = 0
+
+    def session(self):
+        return _async_session(SessionLocal(bind=self.engine), self.async_factory, self.slots)
+
+    async def ping(self):
+        if self.async_engine is not None:
+            async with self.async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            await run_in_threadpool(self._ping_sync)
+
+    def _ping_sync(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+
+class ReplicaSet:
+    """Replicas handed out round-robin, skipping those that failed their
+    last health check or a query since.
+    """
+
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = replicas
+        self._turn = itertools.count()
+
+    def pick(self) -> Optional[Replica]:
+        """The next healthy replica, or None when there is none."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_down(self, replica: Replica):
+        replica.healthy = False
+        replica.failures += 1
+
+    async def check(self):
+        """Ping every replica and record which ones answered in time."""
+        for replica in self.replicas:
+            try:
+                await asyncio.wait_for(replica.ping(), settings.database_replica_check_seconds)
+                replica.healthy = True
+            except Exception:
+                # Whatever the failure, keep checking the others and keep
+                # watch() running.
+                log.warning("Replica %s failed its health check", replica.name, exc_info=True)
+                self.mark_down(replica)
+
+    async def watch(self):
+        """Health-check the replicas every DATABASE_REPLICA_CHECK_SECONDS."""
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.database_replica_check_seconds)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+            replica.engine.dispose()
+            metrics.pools.pop(replica.name, None)
+
+    def snapshot(self) -> dict:
+        return {replica.name: {"healthy": replica.healthy, "failures": replica.failures}
+                for replica in self.replicas}
+
+
+async def get_read_db(request: Request, primary=Depends(get_async_db)):
+    """Session dependency for read-only routes.
+
+    Yields a session on the next healthy replica, or the request's primary
+    session from get_async_db when no replica is configured or healthy, or
+    when the request has to see its client's own recent writes (see
+    backend.replicas.ReadRoutingMiddleware). A replica that fails a query
+    is taken out of rotation until its next successful health check.
+    """
+    replica = None
+    if replicas is not None and not getattr(request.state, "read_primary", False):
+        replica = replicas.pick()
+    if replica is None:
+        yield primary
+        return
+
+    try:
+        async with replica.session() as session:
+            yield session
+    except DBAPIError as exc:
+        if isinstance(exc, OperationalError) or exc.connection_invalidated:
+            replicas.mark_down(replica)
+        raise
+
+
+async def stream_partitions(db, statement, size: int):
+    """Yield the rows of `statement` in lists of up to `size`, read through a
+    server-side cursor on a connection of their own.
+
+    The request session is closed before a streamed response body is sent,
+    so the stream borrows the session's engine rather than the session.
+    """
+    if isinstance(db, SyncSession):
+        await db.slots.acquire()
+        conn = None
+        try:
+            conn = await run_in_threadpool(db.get_bind().connect)
+            result = await run_in_threadpool(
+                conn.execute, statement.execution_options(yield_per=size))
+            partitions = result.partitions()
+            while (partition := await run_in_threadpool(next, partitions, None)) is not None:
+                yield partition
+        finally:
+            # Still runs when the client disconnects and the stream is cancelled.
+            with anyio.CancelScope(shield=True):
+                if conn is not None:
+                    await run_in_threadpool(conn.close)
+                db.slots.release()
+        return
+
+    async with db.bind.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=size))
+        async for partition in result.partitions():
+            yield partition
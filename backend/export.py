@@ -0,0 +1,37 @@
+import csv
+import io
+
+from backend import serialization
+
+EXPORT_FIELDS = ("id", "title", "description", "created_at")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_chunk(rows) -> bytes:
+    # Encoded like the list endpoints, so each line matches a TaskOut there.
+    return b"".join(serialization.dumps(row) + b"\n" for row in serialization.rows_as_dicts(rows))
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (row.id, row.title, row.description, row.created_at.isoformat()) for row in rows)
+    return buffer.getvalue()
+
+
+async def render(format: str, partitions):
+    """Encode batches of task rows as ndjson or csv, one chunk per batch."""
+    if format == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(EXPORT_FIELDS)
+        yield header.getvalue()
+        async for rows in partitions:
+            yield _csv_chunk(rows)
+    else:
+        async for rows in partitions:
+            yield _ndjson_chunk(rows)
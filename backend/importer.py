@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.util import await_only
+
+from backend import models, schemas
+
+tasks_table = models.Task.__table__
+IMPORT_COLUMNS = ("owner_id", "title", "description")
+
+# Far above the longest valid row, even with every character escaped.
+MAX_LINE_BYTES = 16 * 1024
+
+# Marks a line that outgrew the line limit; the rest of it is skipped.
+OVERLONG = object()
+
+
+async def iter_lines(chunks, max_line_bytes: int = MAX_LINE_BYTES):
+    """Split a byte stream into lines without holding more than one line."""
+    pending = b""
+    skipping = False
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            yield OVERLONG if len(line) > max_line_bytes else line
+        if len(pending) > max_line_bytes:
+            if not skipping:
+                yield OVERLONG
+            skipping = True
+            pending = b""
+    if pending and not skipping:
+        yield OVERLONG if len(pending) > max_line_bytes else pending
+
+
+def _error_messages(e: ValidationError) -> list[str]:
+    return [f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors()]
+
+
+async def _ndjson_records(lines):
+    row = 0
+    async for line in lines:
+        if line is not OVERLONG and not line.strip():
+            continue
+        row += 1
+        if line is OVERLONG:
+            yield row, None, ["Row is too long"]
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row, None, ["Row is not valid JSON"]
+            continue
+        yield row, record, None
+
+
+async def _csv_records(lines):
+    header = None
+    row = 0
+    record = ""
+    async for line in lines:
+        if line is OVERLONG:
+            record = ""
+            row += 1
+            yield row, None, ["Row is too long"]
+            continue
+        # Quoted fields may span lines; a record is complete once its
+        # quotes are balanced.
+        record += line.decode("utf-8", errors="replace") + "\n"
+        if record.count('"') % 2:
+            if len(record) > MAX_LINE_BYTES:
+                record = ""
+                row += 1
+                yield row, None, ["Row is too long"]
+            continue
+        fields, record = next(csv.reader([record]), []), ""
+        if not fields:
+            continue
+        if header is None:
+            header = fields
+            continue
+        row += 1
+        if len(fields) != len(header):
+            yield row, None, [f"Expected {len(header)} fields, got {len(fields)}"]
+            continue
+        yield row, dict(zip(header, fields)), None
+    if record:
+        yield row + 1, None, ["Unterminated quoted field"]
+
+
+async def parse_tasks(format: str, lines):
+    """Yield (row, TaskCreate or None, errors or None) for each uploaded row."""
+    records = _csv_records(lines) if format == "csv" else _ndjson_records(lines)
+    async for row, record, errors in records:
+        if errors:
+            yield row, None, errors
+            continue
+        try:
+            yield row, schemas.TaskCreate.model_validate(record), None
+        except ValidationError as e:
+            yield row, None, _error_messages(e)
+
+
+def copy_tasks(session, owner_id: int, tasks: list[schemas.TaskCreate]):
+    """Load a batch of tasks on the session's connection.
+
+    Uses COPY on psycopg2 and asyncpg and a batched INSERT elsewhere. Runs
+    through run_sync, so asyncpg's coroutine is awaited with await_only.
+    """
+    connection = session.connection()
+    driver = connection.dialect.driver
+    dbapi_connection = connection.connection.driver_connection
+    rows = [(owner_id, task.title, task.description) for task in tasks]
+
+    connection.execute(models.lock_owner(owner_id))
+    if driver == "psycopg2":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {tasks_table.name} ({', '.join(IMPORT_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)", buffer)
+    elif driver == "asyncpg":
+        await_only(dbapi_connection.copy_records_to_table(
+            tasks_table.name, records=rows, columns=IMPORT_COLUMNS))
+    else:
+        connection.execute(insert(tasks_table), [dict(zip(IMPORT_COLUMNS, row)) for row in rows])
+
+    connection.execute(models.task_count_update(owner_id, len(rows)))
@@ -0,0 +1,257 @@
+import math
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from backend import oauth2
+from backend.cache import TTLCache
+from backend.config import settings
+from backend.rate_limit import get_redis
+
+# Refills the bucket for the time since its last use, settles any debt run
+# up by a local pre-limiter, then takes `cost` tokens if there are enough.
+# Uses the Redis clock so every worker agrees on the refill.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local debt = tonumber(ARGV[4])
+local rate = capacity / window
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+tokens = math.max(0, tokens - debt)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / rate)
+end
+
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.max(reset, 1))
+return {allowed, math.floor(tokens), retry_after, reset}
+"""
+
+
+_token_bucket = None
+
+
+def _token_bucket_script(redis):
+    """The token bucket script bound to `redis`; it runs by EVALSHA and
+    loads itself again after a script flush.
+    """
+    global _token_bucket
+    if _token_bucket is None or _token_bucket.registered_client is not redis:
+        _token_bucket = redis.register_script(TOKEN_BUCKET_SCRIPT)
+    return _token_bucket
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    reset: float
+
+    def headers(self) -> dict:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+def parse_budget(budget: str) -> tuple[int, int]:
+    """Split a "<requests>/<seconds>" budget."""
+    requests, _, seconds = budget.partition("/")
+    return int(requests), int(seconds)
+
+
+def identify(request: Request) -> str:
+    """The authenticated user when the request carries a valid token,
+    otherwise the client address.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            token_data = oauth2.verify_access_token(
+                token, HTTPException(status.HTTP_401_UNAUTHORIZED))
+        except HTTPException:
+            token_data = None
+        if token_data is not None and token_data.id is not None:
+            return f"user:{token_data.id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class _LocalState:
+    __slots__ = ("result", "allowance", "debt", "synced_at")
+
+    def __init__(self, result: RateLimitResult, allowance: int):
+        self.result = result
+        self.allowance = allowance
+        self.debt = 0
+        self.synced_at = time.monotonic()
+
+
+class LocalPreLimiter:
+    """Admits requests in-process while a caller is far below its limit.
+
+    After each Redis check a caller may make `fraction` of its remaining
+    tokens' worth of requests locally for up to `sync_seconds`. Those are
+    charged to the Redis bucket as debt on the next check, so each worker
+    can overshoot a limit by at most that allowance.
+    """
+
+    def __init__(self, fraction: float, sync_seconds: float, maxsize: int = 10000):
+        self.fraction = fraction
+        self.sync_seconds = sync_seconds
+        self._states = TTLCache(maxsize, 60)
+
+    def check(self, key: str) -> tuple[Optional[RateLimitResult], int]:
+        """A locally admitted result, or None and the debt to settle in Redis."""
+        state = self._states.get(key)
+        if state is None:
+            return None, 0
+        fresh = time.monotonic() - state.synced_at < self.sync_seconds
+        if not fresh or state.allowance <= 0:
+            return None, state.debt
+        state.allowance -= 1
+        state.debt += 1
+        result = state.result
+        return result._replace(remaining=max(result.remaining - state.debt, 0)), 0
+
+    def update(self, key: str, result: RateLimitResult):
+        allowance = int(result.remaining * self.fraction) if result.allowed else 0
+        self._states.set(key, _LocalState(result, allowance))
+
+    def clear(self):
+        self._states.clear()
+
+
+class FallbackLimiter:
+    """In-process token buckets used while Redis cannot be reached.
+
+    Each worker keeps its own buckets, so the effective limit is
+    approximate: up to one full budget per worker.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._buckets = TTLCache(maxsize, 3600)
+        self.checks = 0
+
+    def take(self, key: str, capacity: int, seconds: int) -> RateLimitResult:
+        self.checks += 1
+        now = time.monotonic()
+        rate = capacity / seconds
+        tokens, last = self._buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - last) * rate)
+
+        allowed = tokens >= 1
+        retry_after = 0.0
+        if allowed:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets.set(key, (tokens, now))
+        return RateLimitResult(allowed, capacity, int(tokens), retry_after,
+                               (capacity - tokens) / rate)
+
+    def clear(self):
+        self._buckets.clear()
+        self.checks = 0
+
+
+fallback_limiter = FallbackLimiter()
+local_limiter = LocalPreLimiter(settings.rate_limit_local_fraction,
+                                settings.rate_limit_local_sync_seconds)
+
+
+class RateLimit:
+    """Route dependency drawing one token from the caller's bucket for a tier.
+
+    Buckets are kept per tier and caller, so reads, writes, logins, exports
+    and imports are budgeted separately. Raises 429 once a bucket is empty
+    and leaves the result on request.state for RateLimitHeadersMiddleware.
+    Falls back to FallbackLimiter when Redis fails or its circuit breaker
+    is open.
+    """
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.capacity, self.seconds = parse_budget(getattr(settings, f"rate_limit_{tier}"))
+
+    async def __call__(self, request: Request):
+        redis = get_redis()
+        if settings.environment == "test" or redis is None:
+            return
+
+        key = f"ratelimit:{self.tier}:{identify(request)}"
+        result, debt = None, 0
+        if local_limiter.fraction > 0:
+            result, debt = local_limiter.check(key)
+        if result is None:
+            try:
+                result = await self._check(redis, key, debt)
+            except RedisError:
+                result = fallback_limiter.take(key, self.capacity, self.seconds)
+            else:
+                if local_limiter.fraction > 0:
+                    local_limiter.update(key, result)
+
+        request.state.rate_limit = result
+        if not result.allowed:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail=f"Rate limit exceeded. Retry after "
+                                       f"{result.headers()['Retry-After']} seconds.")
+
+    async def _check(self, redis, key: str, debt: int) -> RateLimitResult:
+        script = _token_bucket_script(redis)
+        allowed, remaining, retry_after, reset = await script(
+            keys=[key], args=[self.capacity, self.seconds * 1000, 1, debt])
+        return RateLimitResult(bool(allowed), self.capacity, int(remaining),
+                               retry_after / 1000, reset / 1000)
+
+
+read_limit = RateLimit("read")
+write_limit = RateLimit("write")
+login_limit = RateLimit("login")
+export_limit = RateLimit("export")
+import_limit = RateLimit("import")
+
+
+class RateLimitHeadersMiddleware:
+    """Adds X-RateLimit-* headers for the bucket a RateLimit checked."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                result = scope.get("state", {}).get("rate_limit")
+                if result is not None:
+                    headers = list(message.get("headers", []))
+                    headers.extend((name.lower().encode(), value.encode())
+                                   for name, value in result.headers().items())
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
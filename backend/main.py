@@ -1,27 +1,41 @@
-from fastapi import FastAPI, Depends
-from fastapi.middleware.cors import CORSMiddleware
-
-from backend.routers import user, auth, task
-from backend import models
-from backend.database import engine
-from backend.rate_limit import lifespan
-from fastapi_limiter.depends import RateLimiter
-import os
-
-
-models.Base.metadata.create_all(bind=engine)
+import asyncio
+from contextlib import asynccontextmanager
 
-env = os.getenv("ENVIRONMENT", "test")
-dependencies = []
-
-if env != "test":
-    dependencies.append(
-        Depends(
-            RateLimiter(times=2, seconds=5)
-        )
-    )
-
-app = FastAPI(lifespan=lifespan, dependencies=dependencies)
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+
+from backend.routers import user, auth, task, metrics
+from backend import database, rate_limit, tombstones, worker_metrics
+from backend.config import settings
+from backend.limiter import RateLimitHeadersMiddleware
+from backend.metrics import RequestMetricsMiddleware
+from backend.replicas import ReadRoutingMiddleware
+
+
+# The schema is managed by Alembic (backend/migrations), run before the app
+# starts: alembic -c backend/alembic.ini upgrade head
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_engines()
+    background = []
+    if database.replicas is not None:
+        background.append(asyncio.create_task(database.replicas.watch()))
+    if settings.tombstone_purge_seconds > 0:
+        background.append(asyncio.create_task(tombstones.watch()))
+    if settings.metrics_token:
+        background.append(asyncio.create_task(worker_metrics.watch()))
+    try:
+        async with rate_limit.lifespan(app):
+            yield
+    finally:
+        for task in background:
+            task.cancel()
+        await database.dispose_engines()
+
+
+# Routes declare their own rate limit tier; see backend.limiter.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 origins = ["*"]
 
@@ -31,11 +45,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining",
+                    "X-RateLimit-Reset", "Retry-After", "Server-Timing"],
 )
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(ReadRoutingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(user.router)
 app.include_router(task.router)
 app.include_router(auth.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
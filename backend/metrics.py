@@ -0,0 +1,307 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from backend.config import settings
+
+# Time the current checkout spent waiting in _do_get, handed from the pool
+# to the checkout event on the same call stack.
+_checkout_wait: ContextVar[float] = ContextVar("checkout_wait", default=0.0)
+
+
+class _TimedCheckoutMixin:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _checkout_wait.set(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class PoolMetrics:
+    """Connection pool counters for one engine, fed by pool events."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        wait = _checkout_wait.get()
+        self.checkouts += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        stats = {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return stats
+
+
+pools: dict[str, PoolMetrics] = {}
+
+
+def instrument_pool(name: str, engine):
+    """Start collecting pool metrics for a sync Engine under `name`."""
+    pools[name] = PoolMetrics(engine)
+
+
+class RedisMetrics:
+    """Redis command counters and latency, fed by GuardedRedis."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.commands = 0
+        self.failures = 0
+        self.rejected = 0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    def record(self, latency: float, failed: bool):
+        self.commands += 1
+        self.failures += failed
+        self.latency_seconds_total += latency
+        self.latency_seconds_max = max(self.latency_seconds_max, latency)
+
+    def snapshot(self) -> dict:
+        return {
+            "commands": self.commands,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "latency_seconds_total": self.latency_seconds_total,
+            "latency_seconds_max": self.latency_seconds_max,
+        }
+
+
+redis_metrics = RedisMetrics()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def samples(self, name: str, labels: str = ""):
+        """Exposition lines for this histogram."""
+        sep = "," if labels else ""
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        braces = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{braces} {self.sum}"
+        yield f"{name}_count{braces} {self.count}"
+
+
+class RequestStats:
+    """Database work and named phases timed while serving one request."""
+
+    __slots__ = ("queries", "db_seconds", "phases")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.phases: dict[str, float] = {}
+
+    def server_timing(self, total_seconds: float) -> str:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"')
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# Stats of the request being served; a mutable object, so work done in
+# threadpool calls with a copied context still lands on the request.
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the request's Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = request_stats.get()
+        if stats is not None:
+            stats.phases[phase] = stats.phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+class RouteMetrics:
+    """Per-route latency and query histograms."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latency: dict[tuple, Histogram] = {}
+        self.queries: dict[tuple, Histogram] = {}
+        self.db_seconds: dict[tuple, float] = {}
+        self.query_latency = Histogram()
+        self.slow_queries = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route, str(status))
+        self.latency.setdefault(key, Histogram()).observe(seconds)
+        self.queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+        self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+
+
+route_metrics = RouteMetrics()
+slow_query_log = logging.getLogger("backend.slow_queries")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so a statement that raises
+    # leaves nothing behind on the connection.
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    route_metrics.query_latency.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if settings.slow_query_seconds and elapsed >= settings.slow_query_seconds:
+        route_metrics.slow_queries += 1
+        slow_query_log.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+def instrument_queries():
+    """Time every statement run by any Engine, async ones included."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """Times every request, counts its queries, and reports both per route
+    and, with SERVER_TIMING set, in a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            if message["type"] == "http.response.start" and settings.server_timing:
+                timing = stats.server_timing(time.perf_counter() - start)
+                message = {**message, "headers": [
+                    *message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            route = scope.get("route")
+            route_metrics.observe(scope["method"], route.path if route else "unmatched",
+                                  status, time.perf_counter() - start, stats)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus_text(extra_gauges: dict[str, dict] = None) -> str:
+    """Every metric in the Prometheus text exposition format.
+
+    `extra_gauges` maps a metric name prefix to a dict of gauge values.
+    """
+    lines = ["# TYPE http_request_duration_seconds histogram"]
+    for (method, route, status), histogram in sorted(route_metrics.latency.items()):
+        lines.extend(histogram.samples("http_request_duration_seconds",
+                                       _labels(method=method, route=route, status=status)))
+
+    lines.append("# TYPE http_request_db_queries histogram")
+    for (method, route, status), histogram in sorted(route_metrics.queries.items()):
+        lines.extend(histogram.samples("http_request_db_queries",
+                                       _labels(method=method, route=route, status=status)))
+
+    lines.append("# TYPE http_request_db_seconds_total counter")
+    for (method, route, status), seconds in sorted(route_metrics.db_seconds.items()):
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_request_db_seconds_total{{{labels}}} {seconds}")
+
+    lines.append("# TYPE db_query_duration_seconds histogram")
+    lines.extend(route_metrics.query_latency.samples("db_query_duration_seconds"))
+    lines.append("# TYPE db_slow_queries_total counter")
+    lines.append(f"db_slow_queries_total {route_metrics.slow_queries}")
+
+    for name, pool in sorted(pools.items()):
+        for key, value in pool.snapshot().items():
+            lines.append(f'db_pool_{key}{{pool="{name}"}} {value}')
+
+    for prefix, values in (extra_gauges or {}).items():
+        for key, value in values.items():
+            lines.append(f"{prefix}_{key} {float(value)}")
+
+    return "\n".join(lines) + "\n"
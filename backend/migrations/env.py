@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from backend import models
+from backend.database import SQLALCHEMY_DATABASE_URL
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+# sqlalchemy.url may be set to point a run elsewhere, as the tests do.
+url = config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave out what autogenerate cannot compare: the full-text expression
+    index, which Postgres hands back normalised, SQLite's FTS5 tables, and
+    the change_seq index only SQLite builds.
+    """
+    if type_ == "index" and name in ("ix_tasks_search_document", "ix_tasks_change_seq"):
+        return False
+    if type_ == "table" and name.startswith("tasks_fts"):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(url=url, target_metadata=target_metadata, include_object=include_object,
+                      literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          include_object=include_object,
+                          render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,77 @@
+"""task counts, soft deletes, change tracking and search indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 19:40:12.418305
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# SQLite has no tsvector; an external-content FTS5 table kept in sync by
+# triggers stands in for the GIN index (see backend.models).
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id')",
+    "CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER tasks_fts_update AFTER UPDATE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    # Index the tasks that predate the table.
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    postgresql = dialect == "postgresql"
+    statement_time = sa.text("statement_timestamp()" if postgresql else "CURRENT_TIMESTAMP")
+    # SQLite cannot add a column with a non-constant default in place.
+    recreate = "always" if dialect == "sqlite" else "auto"
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('task_count', sa.Integer(), server_default='0', nullable=False))
+    with op.batch_alter_table('tasks', recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=statement_time, nullable=False))
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE tasks SET updated_at = created_at")
+    # GET /todos reports this counter as an exact total.
+    op.execute("UPDATE users SET task_count = (SELECT count(*) FROM tasks "
+               "WHERE owner_id = users.id AND deleted_at IS NULL)")
+
+    op.create_index('ix_tasks_owner_id_created_at_id', 'tasks', ['owner_id', 'created_at', 'id'], unique=False, postgresql_where=sa.text('deleted_at IS NULL'), sqlite_where=sa.text('deleted_at IS NULL'))
+    op.create_index('ix_tasks_owner_id_updated_at_id', 'tasks', ['owner_id', 'updated_at', 'id'], unique=False)
+    if postgresql:
+        op.create_index('ix_tasks_search_document', 'tasks', [sa.text("to_tsvector('simple', title || ' ' || description)")], unique=False, postgresql_using='gin')
+    elif dialect == "sqlite":
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        op.drop_index('ix_tasks_search_document', table_name='tasks', postgresql_using='gin')
+    elif dialect == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS tasks_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS tasks_fts")
+    op.drop_index('ix_tasks_owner_id_updated_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_owner_id_created_at_id', table_name='tasks', postgresql_where=sa.text('deleted_at IS NULL'), sqlite_where=sa.text('deleted_at IS NULL'))
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('deleted_at')
+        batch_op.drop_column('updated_at')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('task_count')
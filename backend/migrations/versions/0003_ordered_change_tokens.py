@@ -0,0 +1,50 @@
+"""number task changes in commit order for change tokens
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 21:05:37.120954
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    postgresql = dialect == "postgresql"
+    # SQLite cannot add a NOT NULL column without a constant default, and
+    # rebuilding tasks would drop its FTS triggers. The models always
+    # supply the value there.
+    if postgresql:
+        op.execute("CREATE SEQUENCE tasks_change_seq")
+        change_seq = sa.text("nextval('tasks_change_seq')")
+    else:
+        change_seq = sa.text("0")
+
+    op.add_column('tasks', sa.Column('change_seq', sa.BigInteger(), server_default=change_seq, nullable=False))
+    # Keep the existing changes in the (updated_at, id) order tokens used.
+    op.execute("UPDATE tasks SET change_seq = numbered.seq FROM ("
+               "SELECT id, row_number() OVER (ORDER BY updated_at, id) AS seq FROM tasks"
+               ") AS numbered WHERE tasks.id = numbered.id")
+    if postgresql:
+        op.execute("SELECT setval('tasks_change_seq', coalesce(max(change_seq), 0) + 1, false) FROM tasks")
+        op.execute("ALTER SEQUENCE tasks_change_seq OWNED BY tasks.change_seq")
+
+    op.drop_index('ix_tasks_owner_id_updated_at_id', table_name='tasks')
+    op.create_index('ix_tasks_owner_id_change_seq_id', 'tasks', ['owner_id', 'change_seq', 'id'], unique=False)
+    if dialect == "sqlite":
+        op.create_index('ix_tasks_change_seq', 'tasks', ['change_seq'], unique=False)
+
+
+def downgrade():
+    if op.get_context().dialect.name == "sqlite":
+        op.drop_index('ix_tasks_change_seq', table_name='tasks')
+    op.drop_index('ix_tasks_owner_id_change_seq_id', table_name='tasks')
+    op.create_index('ix_tasks_owner_id_updated_at_id', 'tasks', ['owner_id', 'updated_at', 'id'], unique=False)
+    # Also drops the sequence change_seq owns on Postgres.
+    op.drop_column('tasks', 'change_seq')
@@ -1,10 +1,69 @@
-from sqlalchemy import ForeignKey, String, Integer, func
+from sqlalchemy import (DDL, BigInteger, DateTime, ForeignKey, Index, String, Integer, event, func,
+                        literal, select, text, update)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql.expression import FunctionElement
 from datetime import datetime
+from typing import Optional
 
 from backend.database import Base
 
 
+class statement_time(FunctionElement):
+    """Start time of the current statement. Unlike now() it advances within
+    a transaction, so change timestamps written by one transaction over
+    several statements stay ordered.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(statement_time)
+def _statement_time(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(statement_time, "postgresql")
+def _statement_time_postgresql(element, compiler, **kw):
+    return "statement_timestamp()"
+
+
+class seconds_ago(FunctionElement):
+    """statement_time() moved back by a number of seconds, in the format the
+    dialect stores timestamps in.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(seconds_ago)
+def _seconds_ago(element, compiler, **kw):
+    return "datetime(CURRENT_TIMESTAMP, '-' || %s || ' seconds')" % compiler.process(
+        element.clauses, **kw)
+
+
+@compiles(seconds_ago, "postgresql")
+def _seconds_ago_postgresql(element, compiler, **kw):
+    return "statement_timestamp() - make_interval(secs => %s)" % compiler.process(
+        element.clauses, **kw)
+
+
+class next_change_seq(FunctionElement):
+    """Next value of the task change counter. See lock_owner."""
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(next_change_seq)
+def _next_change_seq(element, compiler, **kw):
+    return "(SELECT coalesce(max(change_seq), 0) + 1 FROM tasks)"
+
+
+@compiles(next_change_seq, "postgresql")
+def _next_change_seq_postgresql(element, compiler, **kw):
+    return "nextval('tasks_change_seq')"
+
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -12,18 +71,115 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(30), unique=True)
     password: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    task_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     def __repr__(self) -> str:
         return f"User(id={self.id!r}, name={self.name!r}, email={self.email!r})"
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Serves the owner filter plus the (created_at, id) ordering used by
+        # both offset and keyset pagination in GET /todos. Tombstones are
+        # left out, since list reads never return them.
+        Index("ix_tasks_owner_id_created_at_id", "owner_id", "created_at", "id",
+              postgresql_where=text("deleted_at IS NULL"),
+              sqlite_where=text("deleted_at IS NULL")),
+        # Serves GET /todos/changes, which walks (change_seq, id) forward
+        # from the client's change token, tombstones included.
+        Index("ix_tasks_owner_id_change_seq_id", "owner_id", "change_seq", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(30))
     description: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(server_default=statement_time(), onupdate=statement_time())
+    # Deleted tasks are kept as tombstones so sync clients learn about them.
+    deleted_at: Mapped[Optional[datetime]]
+    # Numbers every write in the order GET /todos/changes reports it.
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger, default=next_change_seq(), onupdate=next_change_seq())
     owner_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     owner: Mapped['User'] = relationship()
 
     def __repr__(self) -> str:
-        return f"Task(id={self.id!r}, title={self.title!r})"
\ No newline at end of file
+        return f"Task(id={self.id!r}, title={self.title!r})"
+
+
+# Full-text document searched by GET /todos. The text search configuration
+# and separator are rendered inline so queries match the index expression
+# even with drivers that send parameters separately.
+task_search_document = func.to_tsvector(
+    literal("simple", literal_execute=True),
+    Task.title + literal(" ", literal_execute=True) + Task.description,
+)
+
+Index(
+    "ix_tasks_search_document", task_search_document, postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+
+# COPY in backend.importer skips the defaults above, so on Postgres
+# change_seq defaults on the server too. SQLite has no COPY, and its
+# default looks up the highest change_seq, which it indexes for that.
+for statement in (
+    "CREATE SEQUENCE tasks_change_seq OWNED BY tasks.change_seq",
+    "ALTER TABLE tasks ALTER COLUMN change_seq SET DEFAULT nextval('tasks_change_seq')",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+Index("ix_tasks_change_seq", Task.change_seq).ddl_if(dialect="sqlite")
+
+# SQLite has no tsvector; keep an external-content FTS5 table in sync with
+# triggers instead so search can be exercised against a local database.
+for statement in (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id')",
+    "CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER tasks_fts_update AFTER UPDATE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    Task.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"),
+)
+
+
+def lock_owner(owner_id: int):
+    """SELECT locking a user's row until the transaction ends.
+
+    Every transaction writing tasks runs it before its first write, so the
+    writes of one user take their change_seq values, and commit, one
+    transaction at a time. Change tokens rely on that: no write can commit
+    with a change_seq below one already visible. SQLite needs no lock, as
+    it only ever lets one transaction write.
+    """
+    users = User.__table__
+    return select(users.c.id).where(users.c.id == owner_id).with_for_update()
+
+
+def task_count_update(owner_id: int, delta: int):
+    """UPDATE statement shifting the cached task count of a user."""
+    users = User.__table__
+    return update(users)\
+        .where(users.c.id == owner_id)\
+        .values(task_count=users.c.task_count + delta)
+
+
+@event.listens_for(Task, "after_insert")
+def _task_inserted(mapper, connection, target):
+    connection.execute(task_count_update(target.owner_id, 1))
+
+
+@event.listens_for(Task, "after_delete")
+def _task_deleted(mapper, connection, target):
+    connection.execute(task_count_update(target.owner_id, -1))
@@ -1,11 +1,15 @@
 import jwt
 from jwt.exceptions import InvalidTokenError
 import datetime
-from backend import schemas, models, database
+import time
+from backend import schemas, database, metrics, reads
 from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.cache import user_cache
 from backend.config import settings
+from backend.rate_limit import get_redis
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
 
@@ -18,29 +22,84 @@ def create_access_token(data: dict):
     to_encode = data.copy()
 
     expire = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Sub-second issue time, so a token issued right after a revocation
+    # is still accepted.
+    to_encode.update({"exp": expire, "iat": time.time()})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     return encoded_jwt
 
 
+def create_user_token(user) -> str:
+    """Access token carrying every UserOut field as a claim."""
+    return create_access_token(data={
+        "user_email": user.email,
+        "user_id": user.id,
+        "created_at": user.created_at.isoformat(),
+    })
+
+
 def verify_access_token(token: str, credentials_exception):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = str(payload.get("user_email"))
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(
+            email=email,
+            id=payload.get("user_id"),
+            created_at=payload.get("created_at"),
+            issued_at=payload.get("iat"),
+        )
     except InvalidTokenError:
         raise credentials_exception
 
     return token_data
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)
+def _revoked_key(user_id: int) -> str:
+    return f"user:{user_id}:revoked_before"
+
+
+async def revoke_tokens(user_id: int):
+    """Reject every token issued to the user until now.
+
+    Raises RedisError if the revocation could not be recorded.
+    """
+    redis = get_redis()
+    if redis is None:
+        raise RedisError("Redis is not connected")
+    await redis.set(_revoked_key(user_id), time.time(),
+                    ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+async def is_revoked(token_data: schemas.TokenData) -> bool:
+    """Whether the token was issued before its user's last revocation.
+
+    Fails open: without a reachable Redis, tokens are accepted until they
+    expire.
+    """
+    redis = get_redis()
+    if redis is None or token_data.id is None:
+        return False
+    try:
+        revoked_before = await redis.get(_revoked_key(token_data.id))
+    except RedisError:
+        return False
+    if revoked_before is None:
+        return False
+    return token_data.issued_at is None or token_data.issued_at <= float(revoked_before)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_read_db)
 ) -> schemas.UserOut:
+    with metrics.timed("auth"):
+        return await authenticate(token, db)
+
+
+async def authenticate(token: str, db: AsyncSession) -> schemas.UserOut:
 
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail=f"Could not validate credentials",
@@ -48,6 +107,31 @@ def get_current_user(
 
     token_schema = verify_access_token(token, credentials_exception)
 
-    user = db.query(models.User).filter(models.User.email == token_schema.email).first()
+    if await is_revoked(token_schema):
+        raise credentials_exception
+
+    if settings.auth_stateless and token_schema.id is not None \
+            and token_schema.created_at is not None:
+        # The signature vouches for the claims, so trust them as they are.
+        return schemas.UserOut(id=token_schema.id, email=token_schema.email,
+                               created_at=token_schema.created_at)
+
+    if token_schema.id is None:
+        # Tokens issued before user ids were embedded.
+        row = await reads.user_by_email(db, token_schema.email)
+        if row is None:
+            raise credentials_exception
+        return schemas.UserOut.model_validate(row)
+
+    user = await user_cache.get(token_schema.id)
+    if user is None:
+        row = await reads.user_by_id(db, token_schema.id)
+        if row is None:
+            raise credentials_exception
+        user = schemas.UserOut.model_validate(row)
+        await user_cache.set(user)
+
+    if user.email != token_schema.email:
+        raise credentials_exception
 
-    return user
\ No newline at end of file
+    return user
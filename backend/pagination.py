@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime
+
+# Task ids are Postgres integers; change counters are bigints.
+MAX_ID = 2**31 - 1
+MAX_BIGINT = 2**63 - 1
+
+
+def _encode(fields: list) -> str:
+    raw = json.dumps(fields, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(value: str):
+    padded = value + "=" * (-len(value) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def _check_int(value, low: int, high: int) -> int:
+    if type(value) is not int or not low <= value <= high:
+        raise ValueError(f"Out of range: {value!r}")
+    return value
+
+
+def encode_cursor(timestamp: datetime, id: int) -> str:
+    """Build an opaque cursor pointing just past the given task.
+
+    `timestamp` is the created_at GET /todos is ordered by.
+    """
+    return _encode([timestamp.isoformat(), id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Return the (timestamp, id) pair stored in a cursor.
+
+    Raises ValueError if the cursor was not produced by encode_cursor.
+    """
+    try:
+        timestamp, id = _decode(cursor)
+        return datetime.fromisoformat(timestamp), _check_int(id, 1, MAX_ID)
+    except (ValueError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_change_token(updated_at: datetime, change_seq: int, id: int) -> str:
+    """Build an opaque GET /todos/changes token pointing just past the given
+    change. updated_at only tells when the token expires.
+    """
+    return _encode([updated_at.isoformat(), change_seq, id])
+
+
+def decode_change_token(token: str) -> tuple[datetime, int, int]:
+    """Return the (updated_at, change_seq, id) stored in a token.
+
+    Raises ValueError if the token was not produced by encode_change_token.
+    """
+    try:
+        updated_at, change_seq, id = _decode(token)
+        return (datetime.fromisoformat(updated_at), _check_int(change_seq, 0, MAX_BIGINT),
+                _check_int(id, 1, MAX_ID))
+    except (ValueError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid change token") from e
@@ -1,40 +1,154 @@
-from fastapi import FastAPI, Request, Response, HTTPException, status
+from fastapi import FastAPI
+import asyncio
 import redis.asyncio as redis
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
 from contextlib import asynccontextmanager
-from fastapi_limiter import FastAPILimiter
-from math import ceil
-import os
+import time
 
+from backend import utils
+from backend.config import settings
+from backend.metrics import redis_metrics
 
-async def service_name_identifier(request: Request):
-    service = request.headers.get("Service-Name")
-    return service
 
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open."""
 
-async def custom_callback(request: Request, response: Response, pexpire: int):
+
+class CircuitBreaker:
+    """Stops calls to Redis after `failures` consecutive failures.
+
+    Once `reset_seconds` have passed, a single trial call is let through:
+    success closes the circuit again, failure keeps it open for another
+    `reset_seconds`.
     """
-    default callback when too many requests
-    :param request:
-    :param pexpire: The remaining milliseconds
-    :param response:
-    :return:
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int, reset_seconds: float):
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+        self.trial_running = False
+
+    def abandon(self):
+        """The call was cancelled before Redis answered; allow a new trial."""
+        self.trial_running = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures,
+                "times_opened": self.opened}
+
+
+redis_breaker = CircuitBreaker(settings.redis_breaker_failures,
+                               settings.redis_breaker_reset_seconds)
+
+
+class GuardedCommandsMixin:
+    """Runs every Redis command under a deadline and the circuit breaker,
+    recording its latency.
+
+    Connection problems and timeouts count as failures; error replies
+    from a responsive server do not.
     """
-    expire = ceil(pexpire / 1000)
 
-    raise HTTPException(
-        status.HTTP_429_TOO_MANY_REQUESTS,
-        f"Rate limit exceeded. Retry after {expire} seconds.",
-        headers={"Retry-After": str(expire)},
+    async def execute_command(self, *args, **options):
+        if not redis_breaker.allow():
+            redis_metrics.rejected += 1
+            raise CircuitOpenError("Redis circuit breaker is open")
+
+        start = time.perf_counter()
+        healthy = None
+        try:
+            async with asyncio.timeout(settings.redis_socket_timeout):
+                result = await super().execute_command(*args, **options)
+            healthy = True
+            return result
+        except (ConnectionError, TimeoutError):
+            healthy = False
+            raise
+        except OSError as e:
+            # Includes the builtin TimeoutError raised by asyncio.timeout.
+            healthy = False
+            raise TimeoutError("Redis command failed") from e
+        except RedisError:
+            healthy = True
+            raise
+        finally:
+            if healthy is None:
+                redis_breaker.abandon()
+            else:
+                redis_metrics.record(time.perf_counter() - start, failed=not healthy)
+                if healthy:
+                    redis_breaker.record_success()
+                else:
+                    redis_breaker.record_failure()
+
+
+class GuardedRedis(GuardedCommandsMixin, redis.Redis):
+    pass
+
+
+redis_connection: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis | None:
+    """The shared Redis connection opened by lifespan, if the app is running."""
+    return redis_connection
+
+
+def connect_redis() -> GuardedRedis:
+    pool = redis.BlockingConnectionPool.from_url(
+        settings.redis_url,
+        encoding="utf8",
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_connect_timeout,
+        health_check_interval=30,
     )
+    return GuardedRedis(connection_pool=pool)
+
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    redis_connection = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), encoding="utf8")
-    await FastAPILimiter.init(
-        redis=redis_connection,
-        identifier=service_name_identifier,
-        http_callback=custom_callback,
-    )
+    global redis_connection
+    redis_connection = connect_redis()
     yield
-    await FastAPILimiter.close()
-
+    await redis_connection.aclose(close_connection_pool=True)
+    redis_connection = None
+    utils.shutdown_hash_pool()
@@ -0,0 +1,55 @@
+"""Read-only queries that bypass the ORM.
+
+Statements select plain columns and run on the session's connection, so
+reads skip autoflush, the identity map and ORM result processing and come
+back as Row tuples that the serializers use as they are.
+"""
+from sqlalchemy import select
+
+from backend import models
+
+tasks_table = models.Task.__table__
+users_table = models.User.__table__
+
+task_columns = (tasks_table.c.id, tasks_table.c.title,
+                tasks_table.c.description, tasks_table.c.created_at)
+change_columns = task_columns + (tasks_table.c.updated_at, tasks_table.c.deleted_at)
+user_columns = (users_table.c.id, users_table.c.email, users_table.c.created_at)
+not_deleted = tasks_table.c.deleted_at.is_(None)
+
+
+def _execute(session, statement):
+    return session.connection().execute(statement)
+
+
+def _all(session, statement):
+    return _execute(session, statement).all()
+
+
+def _one_or_none(session, statement):
+    return _execute(session, statement).one_or_none()
+
+
+def _scalar(session, statement):
+    return _execute(session, statement).scalar()
+
+
+async def fetch_all(db, statement) -> list:
+    return await db.run_sync(_all, statement)
+
+
+async def fetch_one_or_none(db, statement):
+    return await db.run_sync(_one_or_none, statement)
+
+
+async def fetch_scalar(db, statement):
+    return await db.run_sync(_scalar, statement)
+
+
+async def user_by_id(db, id: int):
+    """The UserOut columns of a user, or None."""
+    return await fetch_one_or_none(db, select(*user_columns).where(users_table.c.id == id))
+
+
+async def user_by_email(db, email: str):
+    return await fetch_one_or_none(db, select(*user_columns).where(users_table.c.email == email))
@@ -0,0 +1,101 @@
+"""Read-your-writes routing for database.get_read_db.
+
+Read-only routes use a replica, except for clients that wrote within the
+last READ_YOUR_WRITES_SECONDS: their reads stay on the primary until the
+replicas have had time to catch up. Requests that may write always use
+the primary.
+"""
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from backend import database
+from backend.cache import TTLCache
+from backend.config import settings
+from backend.limiter import identify
+from backend.rate_limit import get_redis
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RecentWriters:
+    """Clients that wrote recently, keyed by limiter.identify().
+
+    Kept in Redis while the app holds a connection, so every worker routes
+    a client the same way, and in an in-process TTLCache that answers for
+    this worker without Redis.
+    """
+
+    def __init__(self, maxsize: int):
+        self.local = TTLCache(maxsize, settings.read_your_writes_seconds)
+
+    @staticmethod
+    def _key(identity: str) -> str:
+        return f"wrote:{identity}"
+
+    async def mark(self, identity: str):
+        window = settings.read_your_writes_seconds
+        self.local.ttl = window
+        self.local.set(identity, True)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(self._key(identity), 1, px=max(int(window * 1000), 1))
+            except RedisError:
+                pass
+
+    async def wrote_recently(self, identity: str) -> bool:
+        if self.local.get(identity):
+            return True
+        redis = get_redis()
+        if redis is None:
+            return False
+        try:
+            return bool(await redis.exists(self._key(identity)))
+        except RedisError:
+            return False
+
+    def clear(self):
+        self.local.clear()
+
+
+recent_writers = RecentWriters(10000)
+
+
+async def mark_written(user_id: int):
+    """Keep a user's reads on the primary, for writes made on their behalf
+    by a request that did not carry their token, such as registration.
+    """
+    await recent_writers.mark(f"user:{user_id}")
+
+
+class ReadRoutingMiddleware:
+    """Decides whether get_read_db may use a replica for this request, and
+    remembers clients whose requests wrote.
+
+    Sets request.state.read_primary for unsafe methods and for reads by
+    recent writers. Does nothing unless replicas are configured.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or database.replicas is None:
+            return await self.app(scope, receive, send)
+
+        identity = identify(Request(scope))
+        state = scope.setdefault("state", {})
+        if scope["method"] in SAFE_METHODS:
+            state["read_primary"] = await recent_writers.wrote_recently(identity)
+            return await self.app(scope, receive, send)
+
+        state["read_primary"] = True
+
+        async def send_marking_writer(message):
+            # Marked before the response goes out, so the client's next
+            # read already sees it.
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await recent_writers.mark(identity)
+            await send(message)
+
+        await self.app(scope, receive, send_marking_writer)
@@ -1,25 +1,52 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Response, status, HTTPException
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend import database, schemas, models, utils, oauth2
+from backend.cache import user_cache
+from backend.limiter import login_limit, write_limit
 
 router = APIRouter(tags=['Authentication'])
 
 
-@router.post('/login', response_model=schemas.Token)
-def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+@router.post('/login', response_model=schemas.Token, dependencies=[Depends(login_limit)])
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
 
-    user = db.query(models.User).filter(
-        models.User.email == user_credentials.username).first()
+    user = await db.scalar(select(models.User).where(
+        models.User.email == user_credentials.username))
 
     if not user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
 
-    if not utils.verify(user_credentials.password, user.password):
+    valid, new_hash = await utils.verify_and_update_async(
+        user_credentials.password, user.password)
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
 
-    access_token = oauth2.create_access_token(data={"user_email": user.email})
+    access_token = oauth2.create_user_token(user)
+
+    if new_hash:
+        # Stored with outdated bcrypt settings; upgrade while we have the password.
+        user.password = new_hash
+        await db.commit()
+        await user_cache.flush()
 
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT,
+             dependencies=[Depends(write_limit)])
+async def logout(current_user: schemas.UserOut = Depends(oauth2.get_current_user)):
+    """Revoke every token issued to the current user so far."""
+    try:
+        await oauth2.revoke_tokens(current_user.id)
+    except RedisError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Token revocation is unavailable")
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
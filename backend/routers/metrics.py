@@ -0,0 +1,66 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from backend import database, metrics, worker_metrics
+from backend.cache import task_list_cache
+from backend.config import settings
+from backend.limiter import fallback_limiter
+from backend.rate_limit import redis_breaker
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Metrics describe the deployment, so they are hidden unless
+    METRICS_TOKEN is set, and then need it as a bearer token.
+    """
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+            token.encode(), settings.metrics_token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Invalid metrics token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=['Metrics'],
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)]
+)
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Everything below in the Prometheus text format, for every worker
+    (see backend.worker_metrics). The JSON routes describe the worker that
+    answers.
+    """
+    return await worker_metrics.exposition()
+
+
+@router.get("/pool")
+def get_pool_metrics():
+    return {name: pool.snapshot() for name, pool in metrics.pools.items()}
+
+
+@router.get("/cache")
+def get_cache_metrics():
+    return {"task_list": task_list_cache.stats()}
+
+
+@router.get("/replicas")
+def get_replica_metrics():
+    return database.replicas.snapshot() if database.replicas is not None else {}
+
+
+@router.get("/redis")
+def get_redis_metrics():
+    return {
+        **metrics.redis_metrics.snapshot(),
+        "breaker": redis_breaker.snapshot(),
+        "fallback_rate_limit_checks": fallback_limiter.checks,
+    }
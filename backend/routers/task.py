@@ -1,10 +1,18 @@
-from fastapi import Query, Response, status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import Body, Header, Query, Request, Response, status, HTTPException, Depends, APIRouter
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 
-from sqlalchemy import func
-from backend import models, schemas, oauth2
-from backend.database import get_db
+from sqlalchemy import Integer, String, case, column, func, insert, select, tuple_, update, values
+from backend import (export, importer, metrics, models, schemas, oauth2, pagination, reads,
+                     serialization, tombstones)
+from backend.cache import task_list_cache
+from backend.database import get_async_db, get_read_db, stream_partitions
+from backend.config import settings
+from backend.etag import PRIVATE_REVALIDATE, etag_matches, make_etag, not_modified
+from backend.limiter import export_limit, import_limit, read_limit, write_limit
+from backend.reads import change_columns, not_deleted, task_columns, tasks_table, users_table
+from backend.search import apply_search
 
 
 router = APIRouter(
@@ -12,86 +20,390 @@ router = APIRouter(
     tags=['Tasks']
 )
 
-@router.get("", response_model=schemas.TaskResponse)
-def get_tasks(
-    db: Session = Depends(get_db),
+
+async def count_matches(db, matches):
+    """Count rows matched by a search, giving up after `search_count_limit`.
+
+    Returns the count and whether it is exact.
+    """
+    cap = settings.search_count_limit
+    capped = matches.with_only_columns(models.Task.id).limit(cap + 1).subquery()
+    count = await reads.fetch_scalar(db, select(func.count()).select_from(capped))
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+@router.get("", response_model=schemas.TaskResponse, dependencies=[Depends(read_limit)])
+async def get_tasks(
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserOut = Depends(oauth2.get_current_user),
-    limit: int = Query(10, le=10),
+    limit: int = Query(10, ge=1, le=10),
     page: int = Query(1, ge=1),
-    search: Optional[str] = ""
+    cursor: Optional[str] = None,
+    search: Optional[str] = "",
+    if_none_match: Optional[str] = Header(None)
+):
+    params = (limit, page, cursor, search)
+    headers = {"Cache-Control": PRIVATE_REVALIDATE}
+    version = await task_list_cache.version(current_user.id)
+    if version is not None and task_list_cache.shares_versions():
+        # The version token changes on every write to the user's tasks, so
+        # it identifies this representation without running the query. A
+        # worker-local version misses other workers' writes, so it is only
+        # used when the version comes from Redis.
+        etag = make_etag(current_user.id, version, params)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        headers["ETag"] = etag
+
+    if version is not None and settings.task_cache_enabled:
+        body = await task_list_cache.get(current_user.id, version, params)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=headers)
+    if db is not primary:
+        # A replica can lag behind the version, so pages read from one are
+        # neither cached nor tagged with it.
+        version = None
+        headers.pop("ETag", None)
+
+    matches = select(*task_columns).where(tasks_table.c.owner_id == current_user.id,
+                                          not_deleted)
+    relevance = None
+    if search:
+        matches, relevance = apply_search(
+            matches, search, db.get_bind().dialect.name)
+
+    # Cursors are keyed on (created_at, id), so only page mode can rank
+    # search results by relevance; cursor mode stays chronological.
+    order_by = [models.Task.created_at.desc(), models.Task.id.desc()]
+    if cursor:
+        try:
+            created_at, last_id = pagination.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Invalid cursor")
+        query = matches.where(
+            tuple_(models.Task.created_at, models.Task.id) < (created_at, last_id))\
+            .order_by(*order_by)
+    else:
+        if relevance is not None:
+            order_by.insert(0, relevance)
+        query = matches.order_by(*order_by).offset((page - 1) * limit)
+
+    tasks = await reads.fetch_all(db, query.limit(limit))
+
+    next_cursor = None
+    if len(tasks) == limit and (cursor or relevance is None):
+        next_cursor = pagination.encode_cursor(tasks[-1].created_at, tasks[-1].id)
+
+    if search:
+        total, total_exact = await count_matches(db, matches)
+    else:
+        total = await reads.fetch_scalar(db, select(users_table.c.task_count).where(
+            users_table.c.id == current_user.id))
+        total_exact = True
+
+    with metrics.timed("serialize"):
+        body = serialization.task_page(
+            tasks,
+            limit=limit,
+            page=page,
+            total=total,
+            total_exact=total_exact,
+            next_cursor=next_cursor
+        )
+    if version is not None and settings.task_cache_enabled:
+        await task_list_cache.set(current_user.id, version, params, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/changes", response_model=schemas.TaskChanges, dependencies=[Depends(read_limit)])
+async def get_task_changes(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+    since: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.changes_max_items)
 ):
-    skip = (page-1)*10 if page > 1 else 0
-    tasks = db.query(models.Task).filter(
-        models.Task.owner_id == current_user.id
-    ).filter(models.Task.title.contains(search))\
-        .order_by(models.Task.created_at.desc()).limit(limit).offset(skip).all()
-    
-    total = len(tasks)
-    response = schemas.TaskResponse(
-        data=tasks,
-        limit=limit,
-        page=page,
-        total=total
-    )
-    return response
-
-@router.post("", status_code=status.HTTP_201_CREATED, response_model=schemas.TaskOut)
-def create_task(
+    """Tasks created, updated or deleted after the `since` change token.
+
+    Deleted tasks come back as tombstones with `deleted_at` set. Pass the
+    returned `next_token` as `since` on the next call; it only moves
+    forward, and stays put when nothing changed. Changes come in change_seq
+    order, which is the order they committed in (see models.lock_owner), so
+    no change can commit behind a token. A token older than the tombstone
+    retention gets 410 Gone: the client has to sync from scratch.
+    """
+    order = (tasks_table.c.change_seq, tasks_table.c.id)
+    query = select(*change_columns, tasks_table.c.change_seq)\
+        .where(tasks_table.c.owner_id == current_user.id)
+    if since:
+        try:
+            updated_at, *last = pagination.decode_change_token(since)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Invalid change token")
+        if await reads.fetch_scalar(db, select(tombstones.expired(updated_at))):
+            raise HTTPException(status_code=status.HTTP_410_GONE,
+                                detail="Change token expired")
+        query = query.where(tuple_(*order) > tuple(last))
+
+    rows = await reads.fetch_all(db, query.order_by(*order).limit(limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_token = since
+    if rows:
+        last = rows[-1]
+        next_token = pagination.encode_change_token(last.updated_at, last.change_seq, last.id)
+
+    # change_seq only goes into the token.
+    keys = [column.name for column in change_columns]
+    data = [{key: row._mapping[key] for key in keys} for row in rows]
+    return ORJSONResponse({"data": data,
+                           "next_token": next_token, "has_more": has_more})
+
+@router.get("/export", dependencies=[Depends(export_limit)])
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user)
+):
+    """Every task of the user, oldest first, streamed in constant memory."""
+    query = select(*task_columns)\
+        .where(tasks_table.c.owner_id == current_user.id, not_deleted)\
+        .order_by(tasks_table.c.created_at, tasks_table.c.id)
+    partitions = stream_partitions(db, query, settings.export_batch_size)
+    return StreamingResponse(
+        export.render(format, partitions),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'})
+
+@router.post("/import", response_model=schemas.ImportReport, dependencies=[Depends(import_limit)])
+async def import_tasks(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user)
+):
+    """Create tasks from a streamed ndjson or csv body.
+
+    Rows are validated as they arrive and loaded in committed batches of
+    import_batch_size, so a failed upload keeps the batches before it.
+    Invalid rows are skipped and reported.
+    """
+    report = schemas.ImportReport(imported=0, failed=0, errors=[])
+    batch = []
+
+    async def flush():
+        await db.run_sync(importer.copy_tasks, current_user.id, batch)
+        await db.commit()
+        # Hand the connection back while the next batch is uploaded.
+        await db.close()
+        # Each committed batch is visible right away, even if a later one fails.
+        await task_list_cache.bump(current_user.id)
+        report.imported += len(batch)
+        batch.clear()
+
+    lines = importer.iter_lines(request.stream())
+    async for row, task, errors in importer.parse_tasks(format, lines):
+        if errors:
+            report.failed += 1
+            if len(report.errors) < settings.import_max_errors:
+                report.errors.append(schemas.ImportRowError(row=row, errors=errors))
+            else:
+                report.errors_truncated = True
+            continue
+        batch.append(task)
+        if len(batch) >= settings.import_batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return report
+
+@router.post("", status_code=status.HTTP_201_CREATED, response_model=schemas.TaskOut,
+             dependencies=[Depends(write_limit)])
+async def create_task(
     task: schemas.TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserOut = Depends(oauth2.get_current_user)
 ):
+    await db.execute(models.lock_owner(current_user.id))
     db_task = models.Task(owner_id=current_user.id, **task.model_dump())
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
+    await task_list_cache.bump(current_user.id)
     return db_task
 
-@router.put("/{id}", response_model=schemas.TaskOut)
-def update_task(
-    id: int,
-    updated_task: schemas.TaskCreate,
-    db: Session = Depends(get_db),
+async def missing_task_results(db, ids):
+    """Explain why tasks were left out of an owner-filtered write: 404 if
+    they do not exist or were deleted, 403 if they belong to someone else.
+    """
+    if not ids:
+        return []
+    owners = dict(await reads.fetch_all(
+        db, select(tasks_table.c.id, tasks_table.c.owner_id)
+        .where(tasks_table.c.id.in_(ids), not_deleted)))
+    return [
+        schemas.BulkResult(id=id, status=status.HTTP_403_FORBIDDEN,
+                           detail="Not authorized to perform requested action")
+        if id in owners else
+        schemas.BulkResult(id=id, status=status.HTTP_404_NOT_FOUND,
+                           detail=f"task with id: {id} does not exist")
+        for id in ids
+    ]
+
+
+def reject_duplicate_ids(ids):
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Each task id may appear only once")
+
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=schemas.BulkResponse,
+             dependencies=[Depends(write_limit)])
+async def create_tasks_bulk(
+    tasks: List[schemas.TaskCreate] = Body(..., min_length=1, max_length=settings.bulk_max_items),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserOut = Depends(oauth2.get_current_user)
 ):
-    task_query = db.query(models.Task).filter(models.Task.id == id)
+    await db.execute(models.lock_owner(current_user.id))
+    rows = await db.execute(
+        insert(tasks_table).returning(*task_columns, sort_by_parameter_order=True),
+        [{"owner_id": current_user.id, **task.model_dump()} for task in tasks])
+    created = rows.all()
+    await db.execute(models.task_count_update(current_user.id, len(created)))
+    await db.commit()
+    await task_list_cache.bump(current_user.id)
 
-    task = task_query.first()
+    return schemas.BulkResponse(results=[
+        schemas.BulkResult(id=row.id, status=status.HTTP_201_CREATED,
+                           data=schemas.TaskOut.model_validate(row))
+        for row in created
+    ])
 
-    if task is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"task with id: {id} does not exist")
+def bulk_update_statement(dialect: str, tasks: List[schemas.TaskBulkUpdate]):
+    """One UPDATE applying every change: a join against a VALUES list on
+    Postgres, CASE expressions keyed on the id elsewhere, since SQLite has
+    no UPDATE ... FROM (VALUES ...).
+    """
+    if dialect == "postgresql":
+        changes = values(
+            column("id", Integer), column("title", String), column("description", String),
+            name="changes",
+        ).data([(task.id, task.title, task.description) for task in tasks])
+        return update(tasks_table)\
+            .where(tasks_table.c.id == changes.c.id)\
+            .values(title=changes.c.title, description=changes.c.description)
+
+    return update(tasks_table)\
+        .where(tasks_table.c.id.in_([task.id for task in tasks]))\
+        .values(title=case({task.id: task.title for task in tasks}, value=tasks_table.c.id),
+                description=case({task.id: task.description for task in tasks},
+                                 value=tasks_table.c.id))
 
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
+@router.patch("/bulk", response_model=schemas.BulkResponse, dependencies=[Depends(write_limit)])
+async def update_tasks_bulk(
+    tasks: List[schemas.TaskBulkUpdate] = Body(..., min_length=1, max_length=settings.bulk_max_items),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user)
+):
+    ids = [task.id for task in tasks]
+    reject_duplicate_ids(ids)
 
-    task_query.update(updated_task.model_dump(), synchronize_session=False)
+    await db.execute(models.lock_owner(current_user.id))
+    rows = await db.execute(
+        bulk_update_statement(db.get_bind().dialect.name, tasks)
+        .where(tasks_table.c.owner_id == current_user.id, not_deleted)
+        .returning(*task_columns))
+    updated = {row.id: row for row in rows.all()}
+    await db.commit()
+    if updated:
+        await task_list_cache.bump(current_user.id)
 
-    db.commit()
+    missing = await missing_task_results(db, [id for id in ids if id not in updated])
+    results = {result.id: result for result in missing}
+    for id, row in updated.items():
+        results[id] = schemas.BulkResult(id=id, status=status.HTTP_200_OK,
+                                         data=schemas.TaskOut.model_validate(row))
 
-    return task_query.first()
+    return schemas.BulkResponse(results=[results[id] for id in ids])
 
-@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
-    id: int,
-    db: Session = Depends(get_db),
+@router.delete("/bulk", response_model=schemas.BulkResponse, dependencies=[Depends(write_limit)])
+async def delete_tasks_bulk(
+    ids: List[int] = Body(..., min_length=1, max_length=settings.bulk_max_items),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserOut = Depends(oauth2.get_current_user)
 ):
+    reject_duplicate_ids(ids)
 
-    task_query = db.query(models.Task).filter(models.Task.id == id)
+    await db.execute(models.lock_owner(current_user.id))
+    rows = await db.execute(
+        update(tasks_table)
+        .where(tasks_table.c.id.in_(ids), tasks_table.c.owner_id == current_user.id, not_deleted)
+        .values(deleted_at=models.statement_time())
+        .returning(tasks_table.c.id))
+    deleted = set(rows.scalars().all())
+    if deleted:
+        await db.execute(models.task_count_update(current_user.id, -len(deleted)))
+    await db.commit()
+    if deleted:
+        await task_list_cache.bump(current_user.id)
 
-    task = task_query.first()
+    missing = await missing_task_results(db, [id for id in ids if id not in deleted])
+    results = {result.id: result for result in missing}
+    for id in deleted:
+        results[id] = schemas.BulkResult(id=id, status=status.HTTP_204_NO_CONTENT)
+
+    return schemas.BulkResponse(results=[results[id] for id in ids])
+
+async def raise_task_miss(db, id):
+    """Raise the 404 or 403 for a single-task write that matched no row."""
+    miss, = await missing_task_results(db, [id])
+    raise HTTPException(status_code=miss.status, detail=miss.detail)
+
+@router.put("/{id}", response_model=schemas.TaskOut, dependencies=[Depends(write_limit)])
+async def update_task(
+    id: int,
+    updated_task: schemas.TaskCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user)
+):
+    await db.execute(models.lock_owner(current_user.id))
+    task = (await db.execute(
+        update(tasks_table)
+        .where(tasks_table.c.id == id, tasks_table.c.owner_id == current_user.id, not_deleted)
+        .values(**updated_task.model_dump())
+        .returning(*task_columns))).one_or_none()
 
     if task is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"task with id: {id} does not exist")
+        await raise_task_miss(db, id)
+
+    await db.commit()
+    await task_list_cache.bump(current_user.id)
+
+    return task
+
+@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(write_limit)])
+async def delete_task(
+    id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user)
+):
+    await db.execute(models.lock_owner(current_user.id))
+    deleted = await db.scalar(
+        update(tasks_table)
+        .where(tasks_table.c.id == id, tasks_table.c.owner_id == current_user.id, not_deleted)
+        .values(deleted_at=models.statement_time())
+        .returning(tasks_table.c.id))
 
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
+    if deleted is None:
+        await raise_task_miss(db, id)
 
-    task_query.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(models.task_count_update(current_user.id, -1))
+    await db.commit()
+    await task_list_cache.bump(current_user.id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,39 +1,61 @@
-from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from backend import models, schemas, oauth2, utils
-from backend.database import get_db
+from typing import Optional
+
+from fastapi import Header, Response, status, HTTPException, Depends, APIRouter
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend import models, schemas, oauth2, reads, replicas, utils
+from backend.cache import user_cache
+from backend.database import get_async_db, get_read_db
+from backend.limiter import read_limit, write_limit
+from backend.etag import PRIVATE_REVALIDATE, etag_matches, make_etag, not_modified
 
 router = APIRouter(
     prefix="/users",
     tags=['Users']
 )
 
-@router.post("/register", status_code=status.HTTP_201_CREATED, response_model=schemas.Token)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    user_query = db.query(models.User).filter(
-        models.User.email == user.email).first()
+@router.post("/register", status_code=status.HTTP_201_CREATED, response_model=schemas.Token,
+             dependencies=[Depends(write_limit)])
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    user_query = await reads.user_by_email(db, user.email)
 
     if user_query:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=f"User already exists")
 
-    hashed_password = utils.hash(user.password)
+    hashed_password = await utils.hash_async(user.password)
     user.password = hashed_password
 
     new_user = models.User(**user.model_dump())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    # The request carried no token, so the middleware marked the address.
+    await replicas.mark_written(new_user.id)
 
-    access_token = oauth2.create_access_token(data={"user_email": user.email})
+    access_token = oauth2.create_user_token(new_user)
 
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.get('/{id}', response_model=schemas.UserOut)
-def get_user(id: int, db: Session = Depends(get_db), ):
-    user = db.query(models.User).filter(models.User.id == id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"User with id: {id} does not exist")
-
+@router.get('/{id}', response_model=schemas.UserOut, dependencies=[Depends(read_limit)])
+async def get_user(
+    id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None)
+):
+    user = await user_cache.get(id)
+    if user is None:
+        row = await reads.user_by_id(db, id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"User with id: {id} does not exist")
+        user = schemas.UserOut.model_validate(row)
+        await user_cache.set(user)
+
+    etag = make_etag(user.id, user.email, user.created_at.isoformat())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
     return user
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -24,8 +24,12 @@ class UserLogin(BaseModel):
 
 
 class TaskCreate(BaseModel):
-    title: str
-    description: str
+    title: str = Field(max_length=30)
+    description: str = Field(max_length=255)
+
+
+class TaskBulkUpdate(TaskCreate):
+    id: int
 
 
 class TaskOut(BaseModel):
@@ -43,6 +47,42 @@ class TaskResponse(BaseModel):
     limit: int
     page: int
     total: int
+    total_exact: bool = True
+    next_cursor: Optional[str] = None
+
+
+class TaskChange(TaskOut):
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+
+
+class TaskChanges(BaseModel):
+    data: List[TaskChange]
+    next_token: Optional[str] = None
+    has_more: bool
+
+
+class BulkResult(BaseModel):
+    id: Optional[int] = None
+    status: int
+    detail: Optional[str] = None
+    data: Optional[TaskOut] = None
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkResult]
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
 
 
 class Token(BaseModel):
@@ -52,3 +92,6 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    issued_at: Optional[float] = None
@@ -0,0 +1,42 @@
+import re
+
+from sqlalchemy import column, func, literal, or_, table
+
+from backend import models
+
+tasks_fts = table("tasks_fts", column("rowid"), column("rank"), column("tasks_fts"))
+
+
+def search_terms(search: str) -> list[str]:
+    return re.findall(r"\w+", search.lower())
+
+
+def apply_search(query, search: str, dialect: str):
+    """Restrict a task query to tasks whose title or description match `search`.
+
+    Every word in `search` must prefix a word of the task. Uses the tsvector
+    GIN index on PostgreSQL and the FTS5 table on SQLite; other backends and
+    searches without any word characters fall back to substring matching.
+
+    Returns the filtered query and an ORDER BY clause putting the best
+    matches first, or None when results cannot be ranked.
+    """
+    Task = models.Task
+    terms = search_terms(search)
+
+    if terms and dialect == "postgresql":
+        ts_query = func.to_tsquery(literal("simple", literal_execute=True),
+                                   " & ".join(f"{term}:*" for term in terms))
+        document = models.task_search_document
+        return query.filter(document.op("@@")(ts_query)), \
+            func.ts_rank(document, ts_query).desc()
+
+    if terms and dialect == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        query = query.join(tasks_fts, tasks_fts.c.rowid == Task.id)\
+            .filter(tasks_fts.c.tasks_fts.op("MATCH")(match))
+        # FTS5 ranks with bm25, where lower is better.
+        return query, tasks_fts.c.rank.asc()
+
+    return query.filter(or_(Task.title.contains(search),
+                            Task.description.contains(search))), None
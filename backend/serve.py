@@ -0,0 +1,76 @@
+"""Production entry point: python -m backend.serve
+
+Runs uvicorn with SERVER_WORKERS processes (one per CPU core when 0), and
+takes keep-alive, backlog and concurrency limits from the settings. Each
+worker imports the app and creates its engines and Redis pool in its own
+lifespan, so no connections are shared across processes; metrics are
+gathered across them through Redis (see backend.worker_metrics). uvloop and
+httptools are used when they are installed.
+"""
+import importlib.util
+import logging
+import os
+
+import uvicorn
+
+from backend import database
+from backend.config import settings
+
+log = logging.getLogger("backend.serve")
+
+
+def cpu_count() -> int:
+    """Cores this process may run on, which can be fewer than the machine has."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    return settings.server_workers if settings.server_workers > 0 else cpu_count()
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def uvicorn_config() -> dict:
+    workers = worker_count()
+    return dict(
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_seconds,
+        limit_concurrency=settings.server_limit_concurrency,
+        timeout_graceful_shutdown=settings.server_graceful_shutdown_seconds,
+        access_log=settings.server_access_log,
+        # Behind a proxy, the client address comes from X-Forwarded-For.
+        proxy_headers=True,
+    )
+
+
+def connections_per_database() -> int:
+    """Most connections one worker opens to each database: a sync pool,
+    plus an async one with DATABASE_ASYNC.
+    """
+    per_pool = settings.database_pool_size + settings.database_max_overflow
+    return per_pool * (2 if settings.database_async else 1)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    config = uvicorn_config()
+    per_database = connections_per_database()
+    databases = 1 + len(database.replica_urls())
+    log.info("Starting %d workers (%s loop, %s parser), up to %d connections each to the "
+             "primary and to each of %d replicas, %d in total", config["workers"],
+             config["loop"], config["http"], per_database, databases - 1,
+             per_database * databases * config["workers"])
+    uvicorn.run("backend.main:app", **config)
+
+
+if __name__ == "__main__":
+    main()
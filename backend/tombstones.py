@@ -0,0 +1,64 @@
+"""Purging of soft-deleted tasks.
+
+Deleted tasks stay behind as tombstones so GET /todos/changes can report
+them, and are removed for good TOMBSTONE_RETENTION_DAYS later. Change
+tokens from before then may have missed a purged delete, so the endpoint
+refuses them (see expired).
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import Connection, delete, literal, select
+from starlette.concurrency import run_in_threadpool
+
+from backend import database, models
+from backend.config import settings
+from backend.reads import tasks_table
+
+log = logging.getLogger("backend.tombstones")
+
+
+def horizon():
+    """Tombstones deleted before this are purged."""
+    return models.seconds_ago(settings.tombstone_retention_days * 86400)
+
+
+def expired(timestamp: datetime):
+    """Whether a change token at `timestamp` predates the retained tombstones."""
+    return literal(timestamp, models.Task.updated_at.type) < horizon()
+
+
+def purge_batch(conn: Connection) -> int:
+    """Delete up to TOMBSTONE_PURGE_BATCH_SIZE expired tombstones and return
+    how many went.
+    """
+    batch = select(tasks_table.c.id)\
+        .where(tasks_table.c.deleted_at < horizon())\
+        .limit(settings.tombstone_purge_batch_size)
+    return conn.execute(delete(tasks_table).where(tasks_table.c.id.in_(batch))).rowcount
+
+
+def purge() -> int:
+    """Purge expired tombstones on the primary, one transaction per batch so
+    none holds its locks for long.
+    """
+    purged = 0
+    while True:
+        with database.engine.begin() as conn:
+            deleted = purge_batch(conn)
+        purged += deleted
+        if deleted < settings.tombstone_purge_batch_size:
+            return purged
+
+
+async def watch():
+    """Purge expired tombstones every TOMBSTONE_PURGE_SECONDS."""
+    while True:
+        try:
+            purged = await run_in_threadpool(purge)
+            if purged:
+                log.info("Purged %d tombstones", purged)
+        except Exception:
+            log.exception("Tombstone purge failed")
+        await asyncio.sleep(settings.tombstone_purge_seconds)
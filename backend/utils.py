@@ -1,12 +1,85 @@
-from passlib.context import CryptContext
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.config import settings
+
+
+@functools.cache
+def pwd_context():
+    """The bcrypt CryptContext, built on first use so passlib and bcrypt
+    stay out of the app's import time.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto",
+                        bcrypt__rounds=settings.bcrypt_rounds)
 
 
 def hash(password: str):
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 
 def verify(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password, hashed_password) -> tuple[bool, Optional[str]]:
+    """Verify a password, returning a fresh hash if the stored one is outdated."""
+    return pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_slots = threading.BoundedSemaphore(
+    max(settings.password_hash_workers, 1) + settings.password_hash_queue_size)
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"))
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run_hashing(fn, *args):
+    """Run a bcrypt call off the event loop.
+
+    Uses the process pool when PASSWORD_HASH_WORKERS > 0, so hashing does
+    not hold this worker's GIL, and answers 503 once the pool is busy and
+    PASSWORD_HASH_QUEUE_SIZE calls are already waiting.
+    """
+    if settings.password_hash_workers <= 0:
+        return await run_in_threadpool(fn, *args)
+
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, retry shortly",
+            headers={"Retry-After": "1"})
+    try:
+        return await asyncio.wrap_future(_get_hash_pool().submit(fn, *args))
+    finally:
+        _hash_slots.release()
+
+
+async def hash_async(password: str) -> str:
+    return await _run_hashing(hash, password)
+
+
+async def verify_and_update_async(plain_password, hashed_password) -> tuple[bool, Optional[str]]:
+    return await _run_hashing(verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,122 @@
+"""Prometheus metrics of every worker process.
+
+Under backend.serve each worker keeps its own counters, and a scrape
+reaches whichever worker accepts the connection. So workers publish their
+exposition to a Redis hash every METRICS_PUBLISH_SECONDS, and GET /metrics
+merges the entries of all live workers, labelling each sample with
+worker="<hostname>:<pid>" so that replicas sharing the Redis never
+collide. Without Redis it reports the answering worker alone.
+"""
+import asyncio
+import json
+import os
+import re
+import socket
+import time
+
+from redis.exceptions import RedisError
+
+from backend import metrics
+from backend.cache import task_list_cache
+from backend.config import settings
+from backend.limiter import fallback_limiter
+from backend.rate_limit import get_redis, redis_breaker
+
+KEY = "metrics:workers"
+SAMPLE = re.compile(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (.*)$")
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+
+def local_exposition() -> str:
+    """This worker's metrics in the Prometheus text format."""
+    breaker = redis_breaker.snapshot()
+    return metrics.prometheus_text({
+        "redis": {
+            **metrics.redis_metrics.snapshot(),
+            "breaker_open": breaker["state"] != redis_breaker.CLOSED,
+            "breaker_times_opened": breaker["times_opened"],
+            "fallback_rate_limit_checks": fallback_limiter.checks,
+        },
+        "task_list_cache": task_list_cache.stats(),
+    })
+
+
+def merge(expositions: dict[str, str]) -> str:
+    """One exposition holding the samples of every worker, grouped by
+    metric family as the text format requires.
+    """
+    types, families = {}, {}
+    for worker, text in sorted(expositions.items()):
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                _, _, name, kind = line.split(" ", 3)
+                types[name] = kind
+                continue
+            match = SAMPLE.match(line)
+            if match is None:
+                continue
+            name, labels, value = match.groups()
+            family = name
+            for suffix in HISTOGRAM_SUFFIXES:
+                if name.endswith(suffix) and name.removesuffix(suffix) in types:
+                    family = name.removesuffix(suffix)
+            labels = f'{labels},worker="{worker}"' if labels else f'worker="{worker}"'
+            families.setdefault(family, []).append(f"{name}{{{labels}}} {value}")
+
+    lines = []
+    for family, samples in families.items():
+        if family in types:
+            lines.append(f"# TYPE {family} {types[family]}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish(redis, text: str):
+    await redis.hset(KEY, worker_id(), json.dumps({"at": time.time(), "text": text}))
+
+
+async def exposition() -> str:
+    """The merged metrics of every worker that published recently."""
+    own = local_exposition()
+    expositions = {worker_id(): own}
+    redis = get_redis()
+    if redis is None:
+        return merge(expositions)
+    try:
+        await publish(redis, own)
+        published = await redis.hgetall(KEY)
+    except RedisError:
+        return merge(expositions)
+
+    # Workers that stopped publishing have exited.
+    cutoff = time.time() - 3 * settings.metrics_publish_seconds
+    stale = []
+    for worker, raw in published.items():
+        worker = worker.decode() if isinstance(worker, bytes) else worker
+        entry = json.loads(raw)
+        if entry["at"] < cutoff:
+            stale.append(worker)
+        else:
+            expositions.setdefault(worker, entry["text"])
+    if stale:
+        try:
+            await redis.hdel(KEY, *stale)
+        except RedisError:
+            pass
+    return merge(expositions)
+
+
+async def watch():
+    """Publish this worker's metrics every METRICS_PUBLISH_SECONDS."""
+    while True:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await publish(redis, local_exposition())
+            except RedisError:
+                pass
+        await asyncio.sleep(settings.metrics_publish_seconds)
@@ -0,0 +1,65 @@
+"""Compare GET /todos throughput for the three ways of resolving the caller.
+
+Usage: python -m benchmarks.bench_auth --requests 2000 --concurrency 10
+
+  db-lookup  every request loads the user row (user cache disabled)
+  cached     user rows come from the in-process user cache
+  claims     AUTH_STATELESS: the user is built from the token claims
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from backend import database, models
+from backend.cache import user_cache
+from backend.config import settings
+from backend.main import app
+from backend.oauth2 import create_user_token
+from benchmarks.bench_concurrency import run_level
+from benchmarks.common import create_user, get_engine, reset_schema, seed_tasks
+
+
+async def run(requests, concurrency):
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+        seed_tasks(conn, owner_id, 100)
+        user = conn.execute(
+            models.User.__table__.select().where(models.User.id == owner_id)).one()
+
+    # The ASGI transport does not run the lifespan that creates the engines.
+    database.init_engines()
+    headers = {"Authorization": f"Bearer {create_user_token(user)}"}
+    ttl = user_cache.local.ttl
+    modes = {
+        "db-lookup": dict(auth_stateless=False, cache_ttl=0),
+        "cached": dict(auth_stateless=False, cache_ttl=ttl),
+        "claims": dict(auth_stateless=True, cache_ttl=ttl),
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'mode':>10} {'req/s':>10} {'p50':>12} {'p99':>12}")
+        for mode, options in modes.items():
+            settings.auth_stateless = options["auth_stateless"]
+            user_cache.local.ttl = options["cache_ttl"]
+            user_cache.local.clear()
+            await run_level(client, headers, concurrency, 50)
+            rps, p50, p99 = await run_level(client, headers, concurrency, requests)
+            print(f"{mode:>10} {rps:>10.1f} {p50:>10.2f}ms {p99:>10.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Latency of GET /todos/changes queries as the task table grows.
+
+Usage: python -m benchmarks.bench_changes --sizes 20000 100000 500000
+
+"idle" syncs from the newest change token, so nothing has changed; it
+should stay flat across sizes. "recent" fetches the last --changed updates.
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+
+from sqlalchemy import select, tuple_, update
+
+from backend import models
+from benchmarks.common import create_user, get_engine, measure, reset_schema, seed_tasks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000, 500_000])
+    parser.add_argument("--changed", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+
+    table = models.Task.__table__
+    changes = select(table).where(table.c.owner_id == owner_id)\
+        .order_by(table.c.change_seq, table.c.id).limit(args.limit + 1)
+
+    def since(change_seq, id):
+        return changes.where(tuple_(table.c.change_seq, table.c.id) > (change_seq, id))
+
+    print(f"{'tasks':>10} {'idle p50':>10} {'idle p99':>10} {'recent p50':>12} {'recent p99':>12}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        with engine.begin() as conn:
+            seed_tasks(conn, owner_id, size - seeded, start=seeded)
+            if engine.dialect.name == "postgresql":
+                conn.exec_driver_sql("ANALYZE tasks")
+        seeded = size
+
+        with engine.begin() as conn:
+            before = conn.execute(
+                select(table.c.change_seq, table.c.id)
+                .order_by(table.c.change_seq.desc(), table.c.id.desc()).limit(1)).one()
+        with engine.begin() as conn:
+            conn.execute(update(table)
+                         .where(table.c.id.in_(select(table.c.id).limit(args.changed)))
+                         .values(title="changed"))
+
+        with engine.connect() as conn:
+            latest = conn.execute(
+                select(table.c.change_seq, table.c.id)
+                .order_by(table.c.change_seq.desc(), table.c.id.desc()).limit(1)).one()
+            idle = since(*latest)
+            recent = since(*before)
+
+            idle_p50, idle_p99 = measure(lambda: conn.execute(idle).all())
+            recent_p50, recent_p99 = measure(lambda: conn.execute(recent).all())
+
+        print(f"{size:>10} {idle_p50:>8.2f}ms {idle_p99:>8.2f}ms "
+              f"{recent_p50:>10.2f}ms {recent_p99:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure GET /todos throughput as concurrency grows, sync vs async sessions.
+
+Usage: python -m benchmarks.bench_concurrency --concurrency 1 10 50 100 200
+
+Each mode runs in its own process with DATABASE_ASYNC set accordingly and
+drives the app in-process through httpx's ASGI transport, so the numbers
+reflect the app and database rather than the network. Drops and recreates
+the schema of the configured database.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+MODES = {"sync": "false", "async": "true"}
+
+
+async def run_level(client, headers, concurrency, requests):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            res = await client.get("/todos?limit=10", headers=headers)
+            res.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return requests / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def run_mode(levels, requests):
+    from backend.database import init_engines
+    from backend.main import app
+    from backend.oauth2 import create_access_token
+    from benchmarks.common import create_user, get_engine, reset_schema, seed_tasks
+
+    # The ASGI transport does not run the lifespan that creates the engines.
+    init_engines()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+        seed_tasks(conn, owner_id, 1000)
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_email': 'bench@example.com'})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_level(client, headers, 1, 20)
+        for concurrency in levels:
+            rps, p50, p99 = await run_level(client, headers, concurrency, requests)
+            print(f"{concurrency:>12} {rps:>10.1f} {p50:>10.2f}ms {p99:>10.2f}ms", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run_mode(args.concurrency, args.requests))
+        return
+
+    for mode, flag in MODES.items():
+        print(f"== {mode} sessions")
+        print(f"{'concurrency':>12} {'req/s':>10} {'p50':>12} {'p99':>12}", flush=True)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_concurrency", "--mode", mode,
+             "--requests", str(args.requests), "--concurrency", *map(str, args.concurrency)],
+            env={**os.environ, "DATABASE_ASYNC": flag},
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Peak Python memory of GET /todos/export as the user's task count grows.
+
+Usage: python -m benchmarks.bench_export --sizes 10000 100000 1000000
+
+Streams each export through the same code path as the endpoint and
+reports the tracemalloc peak next to that of loading the rows with
+.all() and encoding them in one piece (skipped with --no-buffered).
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend import export
+from backend.config import settings
+from backend.database import SyncSession, stream_partitions
+from backend.routers.task import task_columns, tasks_table
+from benchmarks.common import create_user, get_engine, reset_schema, seed_tasks
+
+
+async def streamed(db, query, format):
+    size = 0
+    async for chunk in export.render(format, stream_partitions(db, query, settings.export_batch_size)):
+        size += len(chunk)
+    return size
+
+
+async def buffered(db, query, format):
+    rows = (await db.execute(query)).all()
+
+    async def one_partition():
+        yield rows
+
+    return sum([len(chunk) async for chunk in export.render(format, one_partition())])
+
+
+def profile(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = asyncio.run(fn(*args))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak / 2**20, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--format", choices=export.MEDIA_TYPES, default="ndjson")
+    parser.add_argument("--no-buffered", dest="buffered", action="store_false")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+
+    query = select(*task_columns)\
+        .where(tasks_table.c.owner_id == owner_id, tasks_table.c.deleted_at.is_(None))\
+        .order_by(tasks_table.c.created_at, tasks_table.c.id)
+
+    print(f"{'tasks':>10} {'bytes':>12} {'stream peak':>12} {'stream time':>12} {'buffered peak':>14}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        with engine.begin() as conn:
+            seed_tasks(conn, owner_id, size - seeded, start=seeded)
+        seeded = size
+
+        db = SyncSession(Session(engine))
+        total, stream_peak, elapsed = profile(streamed, db, query, args.format)
+        buffered_peak = "-"
+        if args.buffered:
+            _, peak, _ = profile(buffered, db, query, args.format)
+            buffered_peak = f"{peak:.1f}MiB"
+        asyncio.run(db.close())
+
+        print(f"{size:>10} {total:>12} {stream_peak:>9.1f}MiB {elapsed:>11.2f}s {buffered_peak:>14}")
+
+
+if __name__ == "__main__":
+    main()
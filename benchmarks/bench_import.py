@@ -0,0 +1,98 @@
+"""Throughput and peak memory of POST /todos/import.
+
+Usage: python -m benchmarks.bench_import --rows 100000 300000
+
+Streams a generated ndjson body straight into the ASGI app, once with
+COPY and once with the batched-INSERT fallback, and reports rows per
+second and the tracemalloc peak. (TestClient would read the whole body
+into memory before sending it.)
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+import tracemalloc
+from unittest import mock
+
+from sqlalchemy.orm import Session
+
+from backend import oauth2
+from backend.database import get_db
+from backend.main import app
+from benchmarks.common import create_user, get_engine, reset_schema
+
+CHUNK_ROWS = 500
+
+
+async def post_import(token, rows):
+    def chunks():
+        for start in range(0, rows, CHUNK_ROWS):
+            yield "".join(
+                json.dumps({"title": f"task {i}", "description": f"description {i}"}) + "\n"
+                for i in range(start, min(start + CHUNK_ROWS, rows))
+            ).encode()
+
+    body = chunks()
+    response = {}
+
+    async def receive():
+        chunk = next(body, None)
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] = response.get("body", b"") + message.get("body", b"")
+
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/todos/import", "raw_path": b"/todos/import", "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+        "headers": [(b"authorization", f"Bearer {token}".encode()),
+                    (b"content-type", b"application/x-ndjson")],
+    }
+    await app(scope, receive, send)
+    assert response["status"] == 200, response
+    return json.loads(response["body"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 300_000])
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+    token = oauth2.create_access_token({"user_email": "bench@example.com", "user_id": owner_id})
+
+    def override_get_db():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    print(f"{'rows':>10} {'path':>8} {'rows/s':>10} {'peak':>10}")
+    for rows in args.rows:
+        for path in ("copy", "insert"):
+            # Any driver other than psycopg2/asyncpg takes the INSERT fallback.
+            driver = mock.patch.object(engine.dialect, "driver", "other") \
+                if path == "insert" else contextlib.nullcontext()
+            with driver:
+                tracemalloc.start()
+                start = time.perf_counter()
+                report = asyncio.run(post_import(token, rows))
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            assert report["imported"] == rows, report
+            print(f"{rows:>10} {path:>8} {rows / elapsed:>10.0f} {peak / 2**20:>7.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare login throughput with bcrypt in the threadpool and in the process pool.
+
+Usage: python -m benchmarks.bench_login --logins 64 --concurrency 8 --workers 4
+
+Keep --concurrency within PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE,
+or the process pool run will start answering 503.
+
+While logins run, a second client polls GET / to show how much hashing
+stalls unrelated requests in the same worker. Drops and recreates the
+schema of the configured database.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from backend import utils
+from backend.config import settings
+from backend.database import init_engines
+from backend.main import app
+from benchmarks.common import get_engine, reset_schema
+
+
+async def login_storm(client, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    form = {"username": "bench@example.com", "password": "password123"}
+
+    async def one():
+        async with semaphore:
+            res = await client.post("/login", data=form)
+            res.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return logins / (time.perf_counter() - start)
+
+
+async def poll(client, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(logins, concurrency, workers):
+    reset_schema(get_engine())
+    # The ASGI transport does not run the lifespan that creates the engines.
+    init_engines()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        res = await client.post("/users/register", json={
+            "name": "bench", "email": "bench@example.com", "password": "password123"})
+        res.raise_for_status()
+
+        print(f"{'mode':>14} {'logins/s':>10} {'GET / p99':>12}")
+        for mode, pool_workers in (("threadpool", 0), (f"{workers} processes", workers)):
+            settings.password_hash_workers = pool_workers
+            await login_storm(client, concurrency, concurrency)
+
+            latencies, stop = [], asyncio.Event()
+            poller = asyncio.create_task(poll(client, stop, latencies))
+            rate = await login_storm(client, logins, concurrency)
+            stop.set()
+            await poller
+
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99)] if latencies else float("nan")
+            print(f"{mode:>14} {rate:>10.1f} {p99:>10.2f}ms")
+
+    utils.shutdown_hash_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.logins, args.concurrency, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare offset and keyset pagination latency for deep pages.
+
+Usage: python -m benchmarks.bench_pagination --sizes 20000 100000 500000
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+
+from sqlalchemy import select, tuple_
+
+from backend import models
+from benchmarks.common import create_user, get_engine, measure, reset_schema, seed_tasks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000, 500_000])
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+
+    Task = models.Task
+    base = select(Task).where(Task.owner_id == owner_id)\
+        .order_by(Task.created_at.desc(), Task.id.desc())
+    skip = (args.page - 1) * args.limit
+
+    print(f"{'tasks':>10} {'offset p50':>12} {'keyset p50':>12} {'offset p99':>12} {'keyset p99':>12}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        with engine.begin() as conn:
+            seed_tasks(conn, owner_id, size - seeded, start=seeded)
+            if engine.dialect.name == "postgresql":
+                conn.exec_driver_sql("ANALYZE tasks")
+        seeded = size
+
+        with engine.connect() as conn:
+            last = conn.execute(base.offset(skip - 1).limit(1)).one()
+            offset_query = base.offset(skip).limit(args.limit)
+            keyset_query = base.where(
+                tuple_(Task.created_at, Task.id) < (last.created_at, last.id)
+            ).limit(args.limit)
+
+            offset_p50, offset_p99 = measure(lambda: conn.execute(offset_query).all())
+            keyset_p50, keyset_p99 = measure(lambda: conn.execute(keyset_query).all())
+
+        print(f"{size:>10} {offset_p50:>10.2f}ms {keyset_p50:>10.2f}ms "
+              f"{offset_p99:>10.2f}ms {keyset_p99:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
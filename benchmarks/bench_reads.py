@@ -0,0 +1,88 @@
+"""Allocation and CPU cost of reading one GET /todos page.
+
+Usage: python -m benchmarks.bench_reads --page-sizes 10 100
+
+Compares, with a fresh session per request as in the app:
+  orm      select(Task) entities through the Session, encoded via TaskResponse
+  columns  reads.fetch_all rows of task_columns on the session's connection,
+           encoded with serialization.task_page
+
+Reports CPU time (process_time) and the tracemalloc peak per request.
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend import models, reads, schemas, serialization
+from benchmarks.common import create_user, get_engine, reset_schema, seed_tasks
+
+
+def peak_per_call(fn, number):
+    """Smallest tracemalloc peak seen over `number` calls."""
+    peaks = []
+    tracemalloc.start()
+    for _ in range(number):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+    return min(peaks)
+
+
+def cpu_per_call(fn, number):
+    start = time.process_time()
+    for _ in range(number):
+        fn()
+    return (time.process_time() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+        seed_tasks(conn, owner_id, max(args.page_sizes) * 10)
+
+    Task = models.Task
+    print(f"{'page':>6} {'path':>8} {'cpu':>10} {'peak':>10}")
+    for page_size in args.page_sizes:
+        fields = dict(limit=page_size, page=1, total=0, total_exact=True, next_cursor=None)
+        entity_query = select(Task).where(Task.owner_id == owner_id)\
+            .order_by(Task.created_at.desc(), Task.id.desc()).limit(page_size)
+        column_query = select(*reads.task_columns)\
+            .where(reads.tasks_table.c.owner_id == owner_id, reads.not_deleted)\
+            .order_by(reads.tasks_table.c.created_at.desc(), reads.tasks_table.c.id.desc())\
+            .limit(page_size)
+
+        def orm():
+            with Session(engine) as session:
+                tasks = session.scalars(entity_query).all()
+                return schemas.TaskResponse(data=tasks, **fields).model_dump_json().encode()
+
+        def columns():
+            with Session(engine) as session:
+                rows = reads._all(session, column_query)
+                return serialization.task_page(rows, **fields)
+
+        for name, fn in (("orm", orm), ("columns", columns)):
+            for _ in range(20):
+                fn()
+            cpu = cpu_per_call(fn, args.number)
+            peak = peak_per_call(fn, 20)
+            print(f"{page_size:>6} {name:>8} {cpu * 1e6:>8.0f}us {peak / 1024:>7.1f}KiB")
+
+
+if __name__ == "__main__":
+    main()
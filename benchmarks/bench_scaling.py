@@ -0,0 +1,132 @@
+"""Throughput of the production server (python -m backend.serve) as it goes
+from 1 to N workers.
+
+Usage: python -m benchmarks.bench_scaling --workers 1 2 4 --concurrency 32 --requests 2000
+
+Seeds benchmarks.dataset, then for each worker count starts the server on
+a free port and drives GET /todos for random seeded users over keep-alive
+connections. The list cache is off, so every request reaches the database.
+The load comes from --clients processes on the same machine, so scaling
+flattens once the workers and clients together outnumber the cores.
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from backend.oauth2 import create_access_token
+from benchmarks import dataset
+from benchmarks.common import get_engine, reset_schema
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, SERVER_WORKERS=str(workers), SERVER_PORT=str(port),
+               SERVER_HOST="127.0.0.1", TASK_CACHE_ENABLED="false")
+    server = subprocess.Popen([sys.executable, "-m", "backend.serve"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError("server did not start within 60s")
+
+
+async def drive(port: int, headers: list[dict], requests: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                 timeout=30) as client:
+        async def worker(count):
+            nonlocal errors
+            for _ in range(count):
+                start = time.perf_counter()
+                res = await client.get(f"/todos?page={rng.randint(1, 20)}",
+                                       headers=rng.choice(headers))
+                latencies.append(time.perf_counter() - start)
+                errors += res.status_code != 200
+
+        per_worker, extra = divmod(requests, concurrency)
+        await asyncio.gather(*(worker(per_worker + (i < extra)) for i in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args):
+    return asyncio.run(drive(*args))
+
+
+def run_load(pool, port, headers, requests, concurrency, clients):
+    jobs = [(port, headers, requests // clients, max(concurrency // clients, 1), seed)
+            for seed in range(clients)]
+    start = time.perf_counter()
+    results = pool.map(client_process, jobs)
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(errors for _, errors in results)
+    return len(latencies) / elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, len(os.sched_getaffinity(0))}))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    user_ids = dataset.generate(engine, args.users, args.tasks)
+    engine.dispose()
+    headers = [
+        {"Authorization": "Bearer " + create_access_token(
+            {"user_email": dataset.user_email(n), "user_id": id})}
+        for n, id in enumerate(user_ids)
+    ]
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50':>10} {'p99':>10} {'errors':>7}")
+    baseline = None
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(workers, port)
+            try:
+                run_load(pool, port, headers, args.requests // 5, args.concurrency, args.clients)
+                rps, latencies, errors = run_load(
+                    pool, port, headers, args.requests, args.concurrency, args.clients)
+            finally:
+                server.terminate()
+                server.wait()
+            baseline = baseline or rps
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            print(f"{workers:>8} {rps:>10.1f} {rps / baseline:>7.2f}x {p50:>8.2f}ms "
+                  f"{p99:>8.2f}ms {errors:>7}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
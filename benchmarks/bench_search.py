@@ -0,0 +1,53 @@
+"""Compare query plans of substring and full-text task search.
+
+Usage: python -m benchmarks.bench_search --size 1000000 --search "task 4242"
+
+Drops and recreates the schema of the configured database, which must be
+PostgreSQL.
+"""
+import argparse
+
+from sqlalchemy import select
+
+from backend import models
+from backend.search import apply_search
+from benchmarks.common import create_user, get_engine, measure, reset_schema, seed_tasks
+
+
+def explain(conn, query):
+    sql = str(query.compile(conn, compile_kwargs={"literal_binds": True}))
+    plan = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {sql}").scalars().all()
+    return "\n".join(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--search", default="task 4242")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    with engine.begin() as conn:
+        owner_id = create_user(conn)
+        seed_tasks(conn, owner_id, args.size)
+        conn.exec_driver_sql("ANALYZE tasks")
+
+    Task = models.Task
+    base = select(Task).where(Task.owner_id == owner_id)
+    order_by = [Task.created_at.desc(), Task.id.desc()]
+
+    old = base.where(Task.title.contains(args.search)).order_by(*order_by).limit(10)
+    new, relevance = apply_search(base, args.search, engine.dialect.name)
+    new = new.order_by(relevance, *order_by).limit(10)
+
+    with engine.connect() as conn:
+        for name, query in (("title.contains", old), ("full-text", new)):
+            p50, p99 = measure(lambda: conn.execute(query).all(), repeat=10)
+            print(f"== {name}: p50 {p50:.2f}ms, p99 {p99:.2f}ms")
+            print(explain(conn, query))
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Per-page cost of serializing a GET /todos response.
+
+Usage: python -m benchmarks.bench_serialization --page-sizes 10 100
+
+Compares, for the same rows:
+  revalidated  ORM entities -> TaskResponse, validated again against the
+               response_model and encoded with jsonable_encoder + json
+  pydantic     ORM entities -> TaskResponse.model_dump_json()
+  orjson       column rows -> serialization.task_page()
+
+Rows come from an in-memory SQLite database; only encoding is timed.
+"""
+import argparse
+import datetime
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from backend import models, schemas, serialization
+from backend.routers.task import task_columns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    size = max(args.page_sizes)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__).values(
+            id=1, name="bench", email="bench@example.com", password="x"))
+        conn.execute(insert(models.Task.__table__), [
+            {"owner_id": 1, "title": f"task {i}", "description": f"description for task {i}",
+             "created_at": datetime.datetime(2024, 1, 1, 12, 0, 0, 123456)}
+            for i in range(size)
+        ])
+
+    print(f"{'page':>6} {'revalidated':>12} {'pydantic':>10} {'orjson':>10}")
+    with Session(engine) as session:
+        for page_size in args.page_sizes:
+            entities = session.scalars(select(models.Task).limit(page_size)).all()
+            rows = session.execute(select(*task_columns).limit(page_size)).all()
+            fields = dict(limit=page_size, page=1, total=size, total_exact=True, next_cursor=None)
+
+            def revalidated():
+                response = schemas.TaskResponse(data=entities, **fields)
+                checked = schemas.TaskResponse.model_validate(response.model_dump())
+                return json.dumps(jsonable_encoder(checked)).encode()
+
+            def pydantic():
+                return schemas.TaskResponse(data=entities, **fields).model_dump_json().encode()
+
+            def orjson():
+                return serialization.task_page(rows, **fields)
+
+            slow, dumped, fast = (
+                min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number * 1e6
+                for fn in (revalidated, pydantic, orjson))
+            print(f"{page_size:>6} {slow:>10.1f}us {dumped:>8.1f}us {fast:>8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure cold start: importing the app, and launching uvicorn until it
+answers its first request.
+
+Usage: python -m benchmarks.bench_startup --runs 5 --output startup.jsonl --label v1.4
+
+Each run starts a fresh interpreter. "import" is the time
+`import backend.main` takes. "first response" runs from spawning uvicorn
+to the first 200 from GET /. With --no-database the app is pointed at a
+closed port, to check that it still boots without Postgres. --output
+appends the medians as a JSON line, so results can be tracked across
+releases.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(env) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1]) * 1000
+
+
+def time_first_response(env, timeout=30.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                try:
+                    if client.get("/").status_code == 200:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-database", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--label", default="")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.no_database:
+        env.update(DATABASE_URL="", DATABASE_HOSTNAME="127.0.0.1", DATABASE_PORT="1")
+
+    imports = [time_import(env) for _ in range(args.runs)]
+    firsts = [time_first_response(env) for _ in range(args.runs)]
+
+    print(f"{'':>16} {'median':>10} {'max':>10}")
+    for name, samples in (("import", imports), ("first response", firsts)):
+        print(f"{name:>16} {statistics.median(samples):>8.0f}ms {max(samples):>8.0f}ms")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({
+                "label": args.label,
+                "runs": args.runs,
+                "import_ms": round(statistics.median(imports), 1),
+                "first_response_ms": round(statistics.median(firsts), 1),
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import datetime
+import pathlib
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, insert, make_url
+
+from backend import models
+from backend.database import SQLALCHEMY_DATABASE_URL
+
+BATCH_SIZE = 10_000
+
+
+def get_engine():
+    return create_engine(SQLALCHEMY_DATABASE_URL)
+
+
+def require_disposable_database(confirmed: bool):
+    """Exit unless the configured database is named like a benchmark
+    database ("bench" in its name) or the caller confirmed with --yes.
+    """
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if confirmed or "bench" in pathlib.Path(url.database or "").name:
+        return
+    sys.exit(f"Refusing to drop every table of {url.render_as_string(hide_password=True)}; "
+             "point DATABASE_URL at a benchmark database or pass --yes.")
+
+
+def reset_schema(engine):
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+def create_user(conn, email="bench@example.com"):
+    return conn.execute(
+        insert(models.User.__table__)
+        .values(name="bench", email=email, password="x")
+        .returning(models.User.id)
+    ).scalar_one()
+
+
+def seed_tasks(conn, owner_id, count, start=0):
+    """Insert `count` tasks for `owner_id`, one second apart, newest first."""
+    base = datetime.datetime(2024, 1, 1)
+    table = models.Task.__table__
+    for offset in range(start, start + count, BATCH_SIZE):
+        rows = [
+            {
+                "title": f"task {i}",
+                "description": f"description for task {i}",
+                "owner_id": owner_id,
+                "created_at": base - datetime.timedelta(seconds=i),
+            }
+            for i in range(offset, min(offset + BATCH_SIZE, start + count))
+        ]
+        conn.execute(insert(table), rows)
+
+
+def measure(fn, repeat=20):
+    """Run `fn` `repeat` times and return (median, p99) latency in ms."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return statistics.median(samples), p99
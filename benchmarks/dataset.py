@@ -0,0 +1,81 @@
+"""Seed N users with M tasks each for the benchmark suite.
+
+Usage: python -m benchmarks.dataset --users 20 --tasks 1000
+
+Every user gets the email bench{n}@example.com and PASSWORD, hashed once
+with the app's password settings. Task titles and descriptions draw from
+a small vocabulary so searches have realistic hit rates.
+
+Drops and recreates the schema of the configured database.
+"""
+import argparse
+import datetime
+import random
+
+from sqlalchemy import insert, select, update
+
+from backend import models, utils
+from benchmarks.common import BATCH_SIZE, get_engine, reset_schema
+
+PASSWORD = "bench-password"
+WORDS = ("buy", "milk", "call", "mom", "write", "report", "fix", "bike", "book",
+         "flight", "pay", "rent", "clean", "kitchen", "plan", "trip", "read",
+         "paper", "water", "plants", "review", "budget", "walk", "dog")
+
+
+def user_email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def generate(engine, users: int, tasks_per_user: int, seed: int = 0) -> list[int]:
+    """Create the dataset and return the user ids; user n is at index n."""
+    rng = random.Random(seed)
+    hashed = utils.hash(PASSWORD)
+    users_table = models.User.__table__
+    tasks_table = models.Task.__table__
+    base = datetime.datetime(2024, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(insert(users_table), [
+            {"name": f"bench {n}", "email": user_email(n), "password": hashed}
+            for n in range(users)
+        ])
+        ids = dict(conn.execute(select(users_table.c.email, users_table.c.id)).all())
+        user_ids = [ids[user_email(n)] for n in range(users)]
+
+        rows = []
+        for owner_id in user_ids:
+            for i in range(tasks_per_user):
+                rows.append({
+                    "owner_id": owner_id,
+                    "title": " ".join(rng.sample(WORDS, 2)),
+                    "description": " ".join(rng.sample(WORDS, 6)),
+                    "created_at": base - datetime.timedelta(seconds=i),
+                })
+                if len(rows) == BATCH_SIZE:
+                    conn.execute(insert(tasks_table), rows)
+                    rows = []
+        if rows:
+            conn.execute(insert(tasks_table), rows)
+
+        conn.execute(update(users_table).values(task_count=tasks_per_user))
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+    generate(engine, args.users, args.tasks, args.seed)
+    print(f"Seeded {args.users} users with {args.tasks} tasks each")
+
+
+if __name__ == "__main__":
+    main()
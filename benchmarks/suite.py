@@ -0,0 +1,243 @@
+"""Scenario benchmarks for the API against a local database.
+
+Usage:
+  DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.suite
+  DATABASE_URL=postgresql://postgres:pw@localhost/todo_bench python -m benchmarks.suite
+  python -m benchmarks.suite --scenarios list_paging search --requests 500
+  python -m benchmarks.suite --update-baseline
+
+Seeds --users x --tasks with benchmarks.dataset, then drives the app
+in-process through httpx's ASGI transport, with fakeredis standing in for
+Redis. Each scenario reports p50/p99 latency, requests per second and
+queries per request (read from the Server-Timing header, which the suite
+turns on).
+
+Results are compared with the baseline stored in benchmarks/baseline.json
+for the same database backend and parameters. The run exits with status 1
+if median latency or queries per request grew, or throughput dropped, by
+more than --threshold (twice that for p99 latency), or new errors appeared. --update-baseline stores the results instead.
+
+Drops and recreates the schema of the configured database, so it refuses
+to run unless the database name contains "bench" or --yes is passed.
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import re
+import statistics
+import sys
+import time
+
+import fakeredis
+import httpx
+
+from backend import database, oauth2, rate_limit
+from backend.config import settings
+from backend.main import app
+from benchmarks import dataset
+from benchmarks.common import get_engine, require_disposable_database, reset_schema
+
+BASELINE_PATH = pathlib.Path(__file__).with_name("baseline.json")
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class FakeRedis(rate_limit.GuardedCommandsMixin, fakeredis.FakeAsyncRedis):
+    pass
+
+
+class Context:
+    """Dataset handles shared by the scenario steps."""
+
+    def __init__(self, user_ids: list[int], seed: int):
+        self.user_ids = user_ids
+        self.rng = random.Random(seed)
+        self.headers = {
+            id: {"Authorization": "Bearer " + oauth2.create_access_token(
+                {"user_email": dataset.user_email(n), "user_id": id})}
+            for n, id in enumerate(user_ids)
+        }
+
+    def user(self) -> int:
+        return self.rng.choice(self.user_ids)
+
+
+async def login_storm(client, ctx, state):
+    n = ctx.rng.randrange(len(ctx.user_ids))
+    return await client.post("/login", data={"username": dataset.user_email(n),
+                                             "password": dataset.PASSWORD})
+
+
+async def list_paging(client, ctx, state):
+    """Walk a user's list five pages deep, then start over with another."""
+    if not state.get("cursor") or state.get("pages", 0) >= 5:
+        state.update(user=ctx.user(), cursor=None, pages=0)
+    url = "/todos?limit=10" + (f"&cursor={state['cursor']}" if state["cursor"] else "")
+    res = await client.get(url, headers=ctx.headers[state["user"]])
+    state["cursor"] = res.json().get("next_cursor") if res.status_code == 200 else None
+    state["pages"] += 1
+    return res
+
+
+async def search(client, ctx, state):
+    terms = " ".join(ctx.rng.sample(dataset.WORDS, ctx.rng.choice((1, 2))))
+    return await client.get("/todos", params={"search": terms, "limit": 10},
+                            headers=ctx.headers[ctx.user()])
+
+
+async def write_mix(client, ctx, state):
+    """50% creates, 30% updates and 20% deletes of tasks made by this worker."""
+    user = state.setdefault("user", ctx.user())
+    headers = ctx.headers[user]
+    owned = state.setdefault("owned", [])
+    roll = ctx.rng.random()
+    if roll < 0.5 or not owned:
+        res = await client.post("/todos", json={"title": "bench", "description": "write mix"},
+                                headers=headers)
+        if res.status_code == 201:
+            owned.append(res.json()["id"])
+        return res
+    if roll < 0.8:
+        return await client.put(f"/todos/{ctx.rng.choice(owned)}",
+                                json={"title": "bench", "description": "updated"},
+                                headers=headers)
+    return await client.delete(f"/todos/{owned.pop()}", headers=headers)
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "list_paging": list_paging,
+    "search": search,
+    "write_mix": write_mix,
+}
+# bcrypt dominates logins, so fewer of them give stable figures.
+REQUEST_SHARE = {"login_storm": 0.1}
+
+
+async def run_scenario(step, ctx, requests: int, concurrency: int) -> dict:
+    latencies, queries = [], []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(count, measured):
+            nonlocal errors
+            state = {}
+            for _ in range(count):
+                start = time.perf_counter()
+                res = await step(client, ctx, state)
+                elapsed = time.perf_counter() - start
+                if not measured:
+                    continue
+                latencies.append(elapsed)
+                errors += res.status_code >= 400
+                match = QUERIES.search(res.headers.get("server-timing", ""))
+                if match:
+                    queries.append(int(match.group(1)))
+
+        warmup = max(requests // 10, 1)
+        await asyncio.gather(*(worker(warmup // concurrency + 1, False) for _ in range(concurrency)))
+        start = time.perf_counter()
+        per_worker, extra = divmod(requests, concurrency)
+        await asyncio.gather(*(worker(per_worker + (i < extra), True) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+    }
+
+
+async def run_all(names: list[str], ctx, requests: int, concurrency: int) -> dict:
+    # One event loop for every scenario: the async engine's pooled
+    # connections are bound to the loop that opened them.
+    results = {}
+    print(f"{'scenario':>12} {'requests':>9} {'rps':>8} {'p50':>9} {'p99':>9} {'queries':>8} {'errors':>7}")
+    for name in names:
+        count = max(int(requests * REQUEST_SHARE.get(name, 1)), concurrency)
+        stats = results[name] = await run_scenario(SCENARIOS[name], ctx, count, concurrency)
+        print(f"{name:>12} {stats['requests']:>9} {stats['rps']:>8} {stats['p50_ms']:>7}ms "
+              f"{stats['p99_ms']:>7}ms {stats['queries_per_request']!s:>8} {stats['errors']:>7}")
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    found = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # The tail is noisier than the median, so it gets twice the slack.
+        for key, slack in (("p50_ms", threshold), ("p99_ms", 2 * threshold)):
+            if stats[key] > base[key] * (1 + slack):
+                found.append(f"{name}: {key} {stats[key]} > baseline {base[key]}")
+        if stats["rps"] < base["rps"] * (1 - threshold):
+            found.append(f"{name}: rps {stats['rps']} < baseline {base['rps']}")
+        if stats["queries_per_request"] is not None and base.get("queries_per_request") is not None \
+                and stats["queries_per_request"] > base["queries_per_request"] * (1 + threshold):
+            found.append(f"{name}: queries_per_request {stats['queries_per_request']} "
+                         f"> baseline {base['queries_per_request']}")
+        if stats["errors"] > base.get("errors", 0):
+            found.append(f"{name}: {stats['errors']} errors, baseline {base.get('errors', 0)}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--yes", action="store_true")
+    args = parser.parse_args()
+
+    require_disposable_database(args.yes)
+    engine = get_engine()
+    reset_schema(engine)
+    user_ids = dataset.generate(engine, args.users, args.tasks, args.seed)
+    # The ASGI transport does not run the app lifespan, which would create
+    # the engines and connect to Redis.
+    database.init_engines()
+    rate_limit.redis_connection = FakeRedis()
+    settings.server_timing = True
+    ctx = Context(user_ids, args.seed)
+
+    results = asyncio.run(run_all(args.scenarios, ctx, args.requests, args.concurrency))
+
+    backend = engine.dialect.name
+    params = {key: getattr(args, key) for key in ("users", "tasks", "requests", "concurrency", "seed")}
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    if args.update_baseline:
+        entry = baselines.setdefault(backend, {"params": params, "results": {}})
+        if entry["params"] != params:
+            entry.update(params=params, results={})
+        entry["results"].update(results)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline for {backend} written to {args.baseline}")
+        return
+
+    entry = baselines.get(backend)
+    if entry is None or entry["params"] != params:
+        print(f"No {backend} baseline with these parameters; skipping the regression check")
+        return
+    regressions = find_regressions(results, entry["results"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} of the {backend} baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,51 @@
-from fastapi.testclient import TestClient
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from backend.main import app
+
+import asyncio
+import os
 
 from backend.config import settings
-from backend.database import get_db
-from backend.database import Base
-from backend.oauth2 import create_access_token
-from backend import models
+
+
+def _admin_engine():
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        f'postgresql+psycopg2://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/postgres',
+        isolation_level="AUTOCOMMIT")
+
+
+def _ensure_database(name):
+    from sqlalchemy import text
+
+    admin = _admin_engine()
+    with admin.connect() as conn:
+        if conn.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}) is None:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+
+
+# Under pytest-xdist every worker runs against a database of its own. This
+# has to happen before backend.database reads its URL from settings.
+if os.environ.get("PYTEST_XDIST_WORKER"):
+    settings.database_name = f'{settings.database_name}_{os.environ["PYTEST_XDIST_WORKER"]}'
+    _ensure_database(settings.database_name)
+
+from fastapi.testclient import TestClient  # noqa: E402
+import fakeredis  # noqa: E402
+from redis.exceptions import ConnectionError as RedisConnectionError  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy import Connection, create_engine, event, insert, update  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from backend.main import app  # noqa: E402
+
+from backend.database import SyncSession, get_db, init_engines  # noqa: E402
+from backend.database import Base  # noqa: E402
+from backend.oauth2 import create_access_token, verify_access_token  # noqa: E402
+from backend import models, rate_limit, utils  # noqa: E402
+from backend.cache import task_list_cache, user_cache  # noqa: E402
+from backend.limiter import fallback_limiter, local_limiter  # noqa: E402
+from backend.metrics import redis_metrics  # noqa: E402
+from backend.rate_limit import redis_breaker  # noqa: E402
+from backend.replicas import recent_writers  # noqa: E402
 
 
 SQLALCHEMY_DATABASE_URL = f'postgresql+psycopg2://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
@@ -16,63 +53,229 @@ SQLALCHEMY_DATABASE_URL = f'postgresql+psycopg2://{settings.database_username}:{
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
+# TestClient does not run the lifespan, which creates the app's engines.
+init_engines()
+
+# Sessions join the test's transaction and turn their commits into
+# savepoints, so nothing a test writes outlives it.
 TestingSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine)
+    autocommit=False, autoflush=False, join_transaction_mode="create_savepoint")
 
+SEED_USERS = 5
+SEED_TASKS = 200
+SEED_PASSWORD = "seed-password"
 
-@pytest.fixture()
-def session():
+
+@pytest.fixture(scope="session")
+def connection():
+    """The connection every test runs on, inside a transaction that is
+    never committed. The schema is created once per run.
+    """
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
+    conn = engine.connect()
+    transaction = conn.begin()
+    try:
+        yield conn
+    finally:
+        transaction.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def empty_database_url():
+    """URL of a newly created, empty database, dropped after the test."""
+    name = f"{settings.database_name}_empty"
+    admin = _admin_engine()
+    with admin.connect() as conn:
+        conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}"')
+        conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+    try:
+        yield SQLALCHEMY_DATABASE_URL.rsplit("/", 1)[0] + f"/{name}"
+    finally:
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}"')
+        admin.dispose()
+
+
+@pytest.fixture(scope="session")
+def replica_database_url():
+    """URL of a second database with the schema, standing in for a read
+    replica. Tests write to it directly and clean up after themselves.
+    """
+    name = f"{settings.database_name}_replica"
+    _ensure_database(name)
+    url = SQLALCHEMY_DATABASE_URL.rsplit("/", 1)[0] + f"/{name}"
+    replica_engine = create_engine(url)
+    Base.metadata.drop_all(bind=replica_engine)
+    Base.metadata.create_all(bind=replica_engine)
+    replica_engine.dispose()
+    return url
+
+
+@pytest.fixture(scope="session")
+def seeded_dataset(connection):
+    """SEED_USERS users with SEED_TASKS tasks each, bulk inserted once per
+    run and shared by the tests that ask for it.
+
+    Session-scoped fixtures are set up before a test's own savepoint, so
+    these rows survive the per-test rollback. Returns user dicts with id,
+    email, task_count and an access token.
+    """
+    users_table, tasks_table = models.User.__table__, models.Task.__table__
+    emails = [f"seed{n}@example.com" for n in range(SEED_USERS)]
+    hashed = utils.hash(SEED_PASSWORD)
+    user_ids = connection.execute(
+        insert(users_table).returning(users_table.c.id, sort_by_parameter_order=True),
+        [{"name": "seed", "email": email, "password": hashed} for email in emails],
+    ).scalars().all()
+    connection.execute(insert(tasks_table), [
+        {"owner_id": user_id, "title": f"seed task {i}", "description": f"seeded {i}"}
+        for user_id in user_ids for i in range(SEED_TASKS)
+    ])
+    connection.execute(update(users_table).where(users_table.c.id.in_(user_ids))
+                       .values(task_count=SEED_TASKS))
+    return [
+        {"id": user_id, "email": email, "task_count": SEED_TASKS,
+         "token": create_access_token({"user_email": email, "user_id": user_id})}
+        for user_id, email in zip(user_ids, emails)
+    ]
+
+
+@pytest.fixture()
+def session(connection):
+    user_cache.local.clear()
+    user_cache.stale.clear()
+    task_list_cache.clear()
+    local_limiter.clear()
+    fallback_limiter.clear()
+    redis_breaker.reset()
+    redis_metrics.reset()
+    recent_writers.clear()
+    transaction = connection.begin_nested()
+    db = TestingSessionLocal(bind=connection)
     try:
         yield db
     finally:
         db.close()
+        transaction.rollback()
+
+
+@pytest.fixture
+def statements(session):
+    """SQL statements sent to the test database while the test runs."""
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        # Savepoints stand in for the commits, which are not recorded either.
+        if "SAVEPOINT" not in statement:
+            executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+class FakeRedis(rate_limit.GuardedCommandsMixin, fakeredis.FakeAsyncRedis):
+    """In-memory Redis behind the production guard, with injectable latency
+    and connection failures.
+    """
+
+    delay = 0.0
+    fail = False
+    calls = 0
+
+    async def _send_command_parse_response(self, *args, **options):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RedisConnectionError("Connection refused")
+        return await super()._send_command_parse_response(*args, **options)
+
+
+@pytest.fixture
+def metrics_headers(monkeypatch):
+    """Headers authorizing a request to the /metrics routes."""
+    monkeypatch.setattr(settings, "metrics_token", "metrics-token")
+    return {"Authorization": "Bearer metrics-token"}
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(rate_limit, "redis_connection", redis)
+    return redis
+
+
+class SharedConnectionBind:
+    """Stands in for the engine behind a test session. connect() hands out
+    the test's own connection, the only one that sees its uncommitted rows,
+    and closing it leaves the connection open.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def connect(self):
+        return self
+
+    def close(self):
+        pass
 
 
 @pytest.fixture()
-def client(session):
+def client(session, monkeypatch):
     def override_get_db():
         try:
             yield session
         finally:
             session.close()
     app.dependency_overrides[get_db] = override_get_db
+
+    # stream_partitions opens a connection of its own from the session's bind.
+    def get_bind(self):
+        bind = self.sync_session.get_bind()
+        return SharedConnectionBind(bind) if isinstance(bind, Connection) else bind
+    monkeypatch.setattr(SyncSession, "get_bind", get_bind)
     yield TestClient(app)
 
 
 def create_test_user(client, user_data):
     response = client.post("/users/register", json=user_data)
     assert response.status_code == 201
-    return response.json()
+    new_user = response.json()
+    # Ids come from sequences, which the per-test rollback does not reset.
+    new_user["id"] = verify_access_token(new_user["access_token"], None).id
+    return new_user
 
 
 @pytest.fixture
 def test_user(client):
     user_data = {
-        "id": 1,
         "name": "luis",
         "email": "luis@gmail.com",
         "password": "password123"
     }
 
     new_user = create_test_user(client, user_data)
-    new_user.update({"id": user_data["id"], "email": user_data["email"], "password": user_data["password"]})
+    new_user.update({"email": user_data["email"], "password": user_data["password"]})
     return new_user
 
 
 @pytest.fixture
 def test_user2(client):
     user_data = {
-        "id": 2,
         "name": "luis",
         "email": "luis123@gmail.com",
         "password": "password123"
     }
 
     new_user = create_test_user(client, user_data)
-    new_user.update({"id": user_data["id"], "email": user_data["email"], "password": user_data["password"]})
+    new_user.update({"email": user_data["email"], "password": user_data["password"]})
     return new_user
 
 
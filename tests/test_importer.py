@@ -0,0 +1,40 @@
+import asyncio
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from backend import importer, models, schemas
+
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_iter_lines_joins_chunks_and_skips_overlong_lines():
+    lines = collect(importer.iter_lines(
+        chunks(b"ab", b"c\n" + b"x" * 8, b"x" * 8, b"xx\nde", b"f"), max_line_bytes=10))
+    assert lines == [b"abc", importer.OVERLONG, b"def"]
+
+
+def test_copy_tasks_falls_back_to_insert():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        user = models.User(name="luis", email="luis@gmail.com", password="x")
+        session.add(user)
+        session.flush()
+
+        tasks = [schemas.TaskCreate(title=f"t{i}", description="d") for i in range(3)]
+        importer.copy_tasks(session, user.id, tasks)
+        session.commit()
+
+        assert session.scalar(select(func.count()).select_from(models.Task)) == 3
+        session.refresh(user)
+        assert user.task_count == 3
@@ -0,0 +1,136 @@
+import pytest
+from redis.exceptions import RedisError
+
+from backend import limiter
+from backend.config import settings
+from backend.oauth2 import create_access_token
+from backend.rate_limit import redis_breaker
+
+
+@pytest.fixture
+def rate_limited(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "environment", "production")
+    monkeypatch.setattr(limiter.write_limit, "capacity", 2)
+    return fake_redis
+
+
+def user_headers(user):
+    token = create_access_token({"user_email": user['email'], "user_id": user['id']})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create(client, headers):
+    return client.post("/todos", json={"title": "t", "description": "d"}, headers=headers)
+
+
+def test_write_budget_exhausts_with_headers(client, test_user, rate_limited):
+    headers = user_headers(test_user)
+    first = create(client, headers)
+    assert first.status_code == 201
+    assert first.headers['X-RateLimit-Limit'] == "2"
+    assert first.headers['X-RateLimit-Remaining'] == "1"
+    assert int(first.headers['X-RateLimit-Reset']) >= 1
+
+    assert create(client, headers).status_code == 201
+    res = create(client, headers)
+    assert res.status_code == 429
+    assert res.headers['X-RateLimit-Remaining'] == "0"
+    assert int(res.headers['Retry-After']) >= 1
+
+
+def test_budgets_are_per_tier_and_per_user(client, test_user, test_user2, rate_limited):
+    headers = user_headers(test_user)
+    for _ in range(2):
+        create(client, headers)
+    assert create(client, headers).status_code == 429
+
+    res = client.get("/todos", headers=headers)
+    assert res.status_code == 200
+    assert res.headers['X-RateLimit-Limit'] == "120"
+    assert create(client, user_headers(test_user2)).status_code == 201
+
+
+def test_imports_and_exports_are_budgeted_separately(authorized_client, test_user,
+                                                     rate_limited, monkeypatch):
+    monkeypatch.setattr(limiter.export_limit, "capacity", 1)
+    monkeypatch.setattr(limiter.import_limit, "capacity", 1)
+    assert authorized_client.get("/todos/export").status_code == 200
+    assert authorized_client.get("/todos/export").status_code == 429
+
+    body = '{"title": "t", "description": "d"}'
+    assert authorized_client.post("/todos/import", content=body).status_code == 200
+    assert authorized_client.post("/todos/import", content=body).status_code == 429
+
+
+def test_local_pre_limiter_skips_redis(client, test_user, rate_limited, monkeypatch):
+    calls = []
+    check = limiter.RateLimit._check
+
+    async def counting_check(self, redis, key, debt):
+        calls.append(debt)
+        return await check(self, redis, key, debt)
+
+    monkeypatch.setattr(limiter.RateLimit, "_check", counting_check)
+    monkeypatch.setattr(limiter.local_limiter, "fraction", 0.5)
+    headers = user_headers(test_user)
+
+    for _ in range(10):
+        assert client.get("/todos", headers=headers).status_code == 200
+    assert len(calls) < 10
+    assert sum(calls) + len(calls) <= 10
+
+    res = client.get("/todos", headers=headers)
+    assert int(res.headers['X-RateLimit-Remaining']) < 120 - 10
+
+
+def test_redis_errors_fall_back_to_local_limits(client, test_user, rate_limited, monkeypatch):
+    async def failing_check(self, redis, key, debt):
+        raise RedisError("down")
+
+    monkeypatch.setattr(limiter.RateLimit, "_check", failing_check)
+    headers = user_headers(test_user)
+    res = create(client, headers)
+    assert res.status_code == 201
+    assert res.headers['X-RateLimit-Remaining'] == "1"
+    assert create(client, headers).status_code == 201
+    assert create(client, headers).status_code == 429
+
+
+def test_slow_redis_opens_breaker_and_falls_back(client, test_user, rate_limited,
+                                                 metrics_headers, monkeypatch):
+    monkeypatch.setattr(settings, "redis_socket_timeout", 0.01)
+    monkeypatch.setattr(redis_breaker, "failure_threshold", 2)
+    rate_limited.delay = 0.05
+    headers = user_headers(test_user)
+
+    assert create(client, headers).status_code == 201
+    assert create(client, headers).status_code == 201
+    assert redis_breaker.state == redis_breaker.OPEN
+
+    calls = rate_limited.calls
+    res = create(client, headers)
+    assert res.status_code == 429
+    assert res.headers['X-RateLimit-Limit'] == "2"
+    assert rate_limited.calls == calls
+
+    stats = client.get("/metrics/redis", headers=metrics_headers).json()
+    assert stats['breaker']['state'] == "open"
+    assert stats['failures'] >= 2
+    assert stats['rejected'] >= 1
+    assert stats['latency_seconds_max'] >= 0.01
+    assert stats['fallback_rate_limit_checks'] == 3
+
+
+def test_breaker_closes_after_successful_trial(client, test_user, rate_limited, monkeypatch):
+    monkeypatch.setattr(redis_breaker, "failure_threshold", 1)
+    headers = user_headers(test_user)
+
+    rate_limited.fail = True
+    assert client.get("/todos", headers=headers).status_code == 200
+    assert redis_breaker.state == redis_breaker.OPEN
+
+    rate_limited.fail = False
+    monkeypatch.setattr(redis_breaker, "reset_seconds", 0)
+    assert redis_breaker.state == redis_breaker.HALF_OPEN
+    assert client.get("/todos", headers=headers).status_code == 200
+    assert redis_breaker.state == redis_breaker.CLOSED
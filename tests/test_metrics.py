@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from backend import database, worker_metrics
+from backend.config import settings
+from backend.metrics import route_metrics
+
+
+def test_pool_metrics(client, metrics_headers):
+    with database.engine.connect():
+        res = client.get("/metrics/pool", headers=metrics_headers)
+
+    stats = res.json()['sync']
+    assert res.status_code == 200
+    assert stats['checked_out'] == 1
+    assert stats['checkouts'] >= 1
+    assert stats['size'] == 5
+    assert stats['wait_seconds_max'] >= 0
+
+    res = client.get("/metrics/pool", headers=metrics_headers)
+    assert res.json()['sync']['checked_out'] == 0
+
+
+def test_metrics_require_token(client, monkeypatch):
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "metrics_token", "metrics-token")
+    assert client.get("/metrics/pool").status_code == 401
+    res = client.get("/metrics/pool", headers={"Authorization": "Bearer wrong"})
+    assert res.status_code == 401
+
+
+def test_cache_metrics(authorized_client, test_tasks, metrics_headers):
+    authorized_client.get("/todos")
+    authorized_client.get("/todos")
+
+    res = authorized_client.get("/metrics/cache", headers=metrics_headers)
+    assert res.status_code == 200
+    assert res.json()['task_list'] == {"hits": 1, "local_hits": 1, "misses": 1,
+                                         "unconfirmed_bumps": 0}
+
+
+def test_server_timing_counts_queries(authorized_client, test_tasks, monkeypatch):
+    assert "Server-Timing" not in authorized_client.get("/").headers
+
+    monkeypatch.setattr(settings, "server_timing", True)
+    res = authorized_client.get("/todos")
+    timing = res.headers['Server-Timing']
+    assert 'auth;dur=' in timing
+    assert 'serialize;dur=' in timing
+    assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* queries"', timing)
+
+
+def test_prometheus_metrics(authorized_client, test_tasks, metrics_headers):
+    route_metrics.reset()
+    authorized_client.get("/todos")
+    authorized_client.get("/todos")
+
+    text = authorized_client.get("/metrics", headers=metrics_headers).text
+    labels = 'method="GET",route="/todos",status="200"'
+    worker = f'worker="{worker_metrics.worker_id()}"'
+    assert f'http_request_duration_seconds_count{{{labels},{worker}}} 2' in text
+    assert f'http_request_db_queries_bucket{{{labels},le="+Inf",{worker}}} 2' in text
+    assert "db_query_duration_seconds_count" in text
+    assert f'redis_breaker_open{{{worker}}} 0.0' in text
+
+
+def test_prometheus_metrics_merge_workers(client, metrics_headers, fake_redis):
+    other = "\n".join([
+        "# TYPE db_slow_queries_total counter",
+        "db_slow_queries_total 7",
+        "# TYPE http_request_db_queries histogram",
+        'http_request_db_queries_bucket{le="+Inf"} 3',
+    ])
+    # Another replica whose worker happens to share this process's pid.
+    same_pid = f"other-host:{os.getpid()}"
+    for worker, at in ((same_pid, time.time()), ("other-host:1", 0)):
+        asyncio.run(fake_redis.hset(worker_metrics.KEY, worker,
+                                    json.dumps({"at": at, "text": other})))
+    text = client.get("/metrics", headers=metrics_headers).text
+
+    own = worker_metrics.worker_id()
+    assert f'db_slow_queries_total{{worker="{same_pid}"}} 7' in text
+    assert f'db_slow_queries_total{{worker="{own}"}} 0' in text
+    assert text.count("# TYPE db_slow_queries_total counter") == 1
+    assert f'http_request_db_queries_bucket{{le="+Inf",worker="{same_pid}"}} 3' in text
+    assert 'worker="other-host:1"' not in text
+    assert sorted(asyncio.run(fake_redis.hkeys(worker_metrics.KEY))) == \
+        sorted([same_pid.encode(), own.encode()])
+
+
+def test_slow_queries_are_logged(authorized_client, test_tasks, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "slow_query_seconds", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="backend.slow_queries"):
+        authorized_client.get("/todos")
+    assert any("FROM tasks" in record.getMessage() for record in caplog.records)
+
+
+def test_failed_statements_leave_no_timing_behind(session):
+    conn = session.connection()
+    with pytest.raises(DBAPIError):
+        with conn.begin_nested():
+            conn.execute(text("SELECT * FROM no_such_table"))
+    conn.execute(text("SELECT 1"))
+    assert "query_start" not in conn.info
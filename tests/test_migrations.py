@@ -0,0 +1,113 @@
+import pathlib
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import (Column, DateTime, ForeignKey, Integer, MetaData, String, Table,
+                        create_engine, func, inspect, insert, select)
+
+from backend import models
+
+ALEMBIC_INI = pathlib.Path(__file__).parents[1] / "backend" / "alembic.ini"
+
+
+def alembic_config(url):
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade_check_downgrade(url):
+    config = alembic_config(url)
+    command.upgrade(config, "head")
+    # Raises if the migrated schema differs from the models.
+    command.check(config)
+    command.downgrade(config, "base")
+
+    engine = create_engine(url)
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+
+def test_migrations_match_models(empty_database_url):
+    upgrade_check_downgrade(empty_database_url)
+
+
+def test_migrations_match_models_sqlite(tmp_path):
+    upgrade_check_downgrade(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def baseline_metadata():
+    """The schema create_all built before migrations existed."""
+    metadata = MetaData()
+    Table("users", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("name", String(30), nullable=False),
+          Column("email", String(30), nullable=False, unique=True),
+          Column("password", String(255), nullable=False),
+          Column("created_at", DateTime, nullable=False, server_default=func.now()))
+    Table("tasks", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("title", String(30), nullable=False),
+          Column("description", String(255), nullable=False),
+          Column("created_at", DateTime, nullable=False, server_default=func.now()),
+          Column("owner_id", Integer, ForeignKey("users.id", ondelete="CASCADE"),
+                 nullable=False))
+    return metadata
+
+
+def upgrade_baseline_database(url):
+    """Upgrade a database created by the pre-migration create_all, stamped
+    at 0001 as the README describes.
+    """
+    metadata = baseline_metadata()
+    engine = create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(metadata.tables["users"]).values(
+            id=1, name="old", email="old@example.com", password="x"))
+        conn.execute(insert(metadata.tables["users"]).values(
+            id=2, name="empty", email="empty@example.com", password="x"))
+        conn.execute(insert(metadata.tables["tasks"]),
+                     [{"title": f"task {i}", "description": "old", "owner_id": 1}
+                      for i in range(3)])
+
+    config = alembic_config(url)
+    command.stamp(config, "0001")
+    command.upgrade(config, "head")
+    command.check(config)
+
+    with engine.begin() as conn:
+        tasks = conn.execute(select(models.Task.updated_at, models.Task.created_at)).all()
+        counts = conn.execute(select(models.User.id, models.User.task_count)
+                              .order_by(models.User.id)).all()
+        conn.execute(insert(models.Task.__table__).values(
+            title="new", description="new", owner_id=1))
+        change_seqs = conn.scalars(select(models.Task.change_seq).order_by(models.Task.id)).all()
+    assert [tuple(row) for row in counts] == [(1, 3), (2, 0)]
+    assert len(tasks) == 3
+    assert all(updated_at == created_at for updated_at, created_at in tasks)
+    assert change_seqs == [1, 2, 3, 4]
+    engine.dispose()
+
+
+def test_upgrade_baseline_database(empty_database_url):
+    upgrade_baseline_database(empty_database_url)
+    engine = create_engine(empty_database_url)
+    with engine.begin() as conn:
+        # As COPY does, leaving the change columns to the server.
+        conn.exec_driver_sql("INSERT INTO tasks (title, description, owner_id) "
+                             "VALUES ('copied', 'copied', 1)")
+        assert conn.exec_driver_sql("SELECT max(change_seq) FROM tasks").scalar() == 5
+    engine.dispose()
+    command.downgrade(alembic_config(empty_database_url), "base")
+
+
+def test_upgrade_baseline_database_sqlite(tmp_path):
+    url = f"sqlite:///{tmp_path / 'baseline.db'}"
+    upgrade_baseline_database(url)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql(
+            "SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'task'").scalar() == 3
+    engine.dispose()
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from backend import database, models
+from backend.config import settings
+from backend.database import Replica, ReplicaSet
+from backend.replicas import recent_writers
+
+
+@pytest.fixture
+def replica(replica_database_url, monkeypatch):
+    """A replica in rotation, and an engine writing straight to it."""
+    replicas = ReplicaSet([Replica("replica0", replica_database_url)])
+    monkeypatch.setattr(database, "replicas", replicas)
+    # Cached pages would hide which database answered.
+    monkeypatch.setattr(settings, "task_cache_enabled", False)
+    engine = create_engine(replica_database_url)
+    yield replicas, engine
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE users, tasks RESTART IDENTITY CASCADE"))
+    engine.dispose()
+    asyncio.run(replicas.dispose())
+
+
+def replicate_user(engine, user, *titles):
+    """Give the replica a copy of the user, plus tasks only it has."""
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__).values(
+            id=user['id'], name="replica", email=user['email'], password="x"))
+        for title in titles:
+            conn.execute(insert(models.Task.__table__).values(
+                title=title, description="replica", owner_id=user['id']))
+
+
+def titles(res):
+    assert res.status_code == 200
+    return [task['title'] for task in res.json()['data']]
+
+
+def test_reads_use_replica(authorized_client, test_user, replica):
+    replicas, engine = replica
+    replicate_user(engine, test_user, "from replica")
+    # Registering just now keeps the user on the primary; skip the window.
+    recent_writers.clear()
+
+    assert titles(authorized_client.get("/todos")) == ["from replica"]
+    assert authorized_client.get(f"/users/{test_user['id']}").status_code == 200
+
+
+def test_writers_read_from_primary_within_window(authorized_client, test_user, replica,
+                                                 monkeypatch):
+    replicas, engine = replica
+    replicate_user(engine, test_user)
+    monkeypatch.setattr(settings, "read_your_writes_seconds", 0.2)
+    recent_writers.clear()
+
+    assert authorized_client.post(
+        "/todos", json={"title": "new task", "description": "primary"}).status_code == 201
+    assert titles(authorized_client.get("/todos")) == ["new task"]
+
+    time.sleep(0.3)
+    assert titles(authorized_client.get("/todos")) == []
+
+
+def test_unhealthy_replica_falls_back_to_primary(authorized_client, test_tasks, replica):
+    replicas, engine = replica
+    replicas.mark_down(replicas.replicas[0])
+
+    assert len(titles(authorized_client.get("/todos"))) == len(test_tasks)
+
+
+def test_health_checks_and_round_robin(replica_database_url):
+    down = replica_database_url.replace(f":{settings.database_port}/", ":1/")
+    replicas = ReplicaSet([Replica("a", down), Replica("b", replica_database_url),
+                           Replica("c", replica_database_url)])
+    try:
+        asyncio.run(replicas.check())
+        assert replicas.snapshot()["a"] == {"healthy": False, "failures": 1}
+        assert [replicas.pick().name for _ in range(4)] == ["b", "c", "b", "c"]
+    finally:
+        asyncio.run(replicas.dispose())
+
+
+def test_replica_pages_are_not_cached_or_tagged(authorized_client, test_user, replica,
+                                               fake_redis, monkeypatch):
+    replicas, engine = replica
+    replicate_user(engine, test_user, "from replica")
+    monkeypatch.setattr(settings, "task_cache_enabled", True)
+    recent_writers.clear()
+
+    res = authorized_client.get("/todos")
+    assert titles(res) == ["from replica"]
+    assert "ETag" not in res.headers
+
+    replicas.mark_down(replicas.replicas[0])
+    res = authorized_client.get("/todos")
+    assert titles(res) == []
+    assert "ETag" in res.headers
+
+
+def test_health_check_survives_unexpected_errors(replica_database_url, monkeypatch, caplog):
+    broken = Replica("broken", replica_database_url)
+    working = Replica("working", replica_database_url)
+    replicas = ReplicaSet([broken, working])
+
+    async def fail():
+        raise RuntimeError("unexpected")
+    monkeypatch.setattr(broken, "ping", fail)
+    try:
+        asyncio.run(replicas.check())
+        assert replicas.snapshot() == {"broken": {"healthy": False, "failures": 1},
+                                       "working": {"healthy": True, "failures": 0}}
+        assert "broken failed its health check" in caplog.text
+    finally:
+        asyncio.run(replicas.dispose())
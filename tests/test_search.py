@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.search import apply_search
+
+
+@pytest.fixture
+def sqlite_session():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        user = models.User(name="luis", email="luis@gmail.com", password="x")
+        session.add(user)
+        session.flush()
+        session.add_all([
+            models.Task(title="buy milk", description="and bread", owner_id=user.id),
+            models.Task(title="walk the dog", description="buy dog food", owner_id=user.id),
+            models.Task(title="read", description="a book about dogs", owner_id=user.id),
+        ])
+        session.commit()
+        yield session
+    models.Base.metadata.drop_all(bind=engine)
+
+
+def search_titles(session, search):
+    query, relevance = apply_search(select(models.Task), search, "sqlite")
+    if relevance is not None:
+        query = query.order_by(relevance)
+    return [task.title for task in session.scalars(query)]
+
+
+def test_sqlite_search_matches_title_and_description(sqlite_session):
+    assert sorted(search_titles(sqlite_session, "buy")) == ["buy milk", "walk the dog"]
+
+
+def test_sqlite_search_matches_prefixes_of_all_terms(sqlite_session):
+    assert search_titles(sqlite_session, "boo dog") == ["read"]
+
+
+def test_sqlite_search_ranks_best_match_first(sqlite_session):
+    assert search_titles(sqlite_session, "dog") == ["walk the dog", "read"]
+
+
+def test_sqlite_search_follows_updates_and_deletes(sqlite_session):
+    task = sqlite_session.scalars(
+        select(models.Task).filter(models.Task.title == "buy milk")).one()
+    task.title = "buy cheese"
+    sqlite_session.commit()
+    assert search_titles(sqlite_session, "cheese") == ["buy cheese"]
+
+    sqlite_session.delete(task)
+    sqlite_session.commit()
+    assert search_titles(sqlite_session, "cheese") == []
@@ -0,0 +1,34 @@
+import logging
+
+from backend import serve
+from backend.config import settings
+
+
+def test_workers_default_to_cpu_count(monkeypatch):
+    monkeypatch.setattr(settings, "server_workers", 0)
+    monkeypatch.setattr(serve, "cpu_count", lambda: 6)
+    assert serve.uvicorn_config()['workers'] == 6
+
+
+def test_server_settings_reach_uvicorn(monkeypatch):
+    monkeypatch.setattr(settings, "server_workers", 3)
+    monkeypatch.setattr(settings, "server_backlog", 512)
+    monkeypatch.setattr(settings, "server_keepalive_seconds", 20)
+    config = serve.uvicorn_config()
+    assert (config['workers'], config['backlog'], config['timeout_keep_alive']) == (3, 512, 20)
+    assert config['loop'] in ("uvloop", "asyncio")
+    assert config['http'] in ("httptools", "h11")
+
+
+def test_connection_total_counts_every_pool(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "server_workers", 2)
+    monkeypatch.setattr(settings, "database_pool_size", 5)
+    monkeypatch.setattr(settings, "database_max_overflow", 10)
+    monkeypatch.setattr(settings, "database_async", True)
+    monkeypatch.setattr(settings, "database_replica_urls", "postgresql://a/db,postgresql://b/db")
+    monkeypatch.setattr(serve.uvicorn, "run", lambda *args, **kwargs: None)
+
+    with caplog.at_level(logging.INFO, logger="backend.serve"):
+        serve.main()
+    assert "up to 30 connections each to the primary and to each of 2 replicas, " \
+           "180 in total" in caplog.text
@@ -1,5 +1,24 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import threading
+from datetime import datetime
+
+import orjson
 import pytest
-from backend import schemas
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from backend import importer, models, pagination, schemas, tombstones
+from backend.cache import task_list_cache
+from backend.config import settings
+from backend.database import Base, get_db
+from backend.main import app
+from backend.rate_limit import redis_breaker
+from tests.conftest import create_test_user
 
 
 def test_get_all_tasks(authorized_client, test_tasks):
@@ -18,6 +37,104 @@ def test_get_all_tasks(authorized_client, test_tasks):
     assert res.status_code == 200
 
 
+def test_get_tasks_with_cursor(authorized_client, test_tasks):
+    res = authorized_client.get("/todos?limit=3")
+    first_page = res.json()
+    assert res.status_code == 200
+    assert len(first_page['data']) == 3
+    assert first_page['next_cursor'] is not None
+
+    res = authorized_client.get(
+        f"/todos?limit=3&cursor={first_page['next_cursor']}")
+    second_page = res.json()
+    assert res.status_code == 200
+    assert len(second_page['data']) == 1
+    assert second_page['next_cursor'] is None
+
+    seen = [task['id'] for task in first_page['data'] + second_page['data']]
+    assert sorted(seen) == sorted(task.id for task in test_tasks)
+
+
+def test_cursor_walks_seeded_list(client, seeded_dataset):
+    user = seeded_dataset[0]
+    headers = {"Authorization": f"Bearer {user['token']}"}
+    seen, cursor = [], None
+    while True:
+        url = "/todos?limit=10" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=headers).json()
+        seen.extend(task['id'] for task in page['data'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == user['task_count']
+    assert page['total'] == user['task_count']
+
+
+def test_get_tasks_invalid_cursor(authorized_client, test_tasks):
+    res = authorized_client.get("/todos?cursor=not-a-cursor")
+    assert res.status_code == 400
+
+
+def crafted(*fields: str) -> str:
+    raw = f'["2024-01-01T00:00:00",{",".join(fields)}]'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("id", ["1e400", "1.5", "true", "0", "-1", str(2**31), str(2**64)])
+def test_crafted_cursor_is_rejected(authorized_client, test_tasks, id):
+    assert authorized_client.get(f"/todos?cursor={crafted(id)}").status_code == 400
+    res = authorized_client.get(f"/todos/changes?since={crafted('1', id)}")
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_get_tasks_rejects_non_positive_limit(authorized_client, test_tasks, limit):
+    res = authorized_client.get(f"/todos?limit={limit}")
+    assert res.status_code == 422
+
+
+def test_get_tasks_total_counts_all_pages(authorized_client, test_tasks):
+    res = authorized_client.get("/todos?limit=2")
+    res_dict = res.json()
+    assert res.status_code == 200
+    assert len(res_dict['data']) == 2
+    assert res_dict['total'] == len(test_tasks)
+    assert res_dict['total_exact'] is True
+
+
+def test_get_tasks_total_after_create_and_delete(authorized_client, test_tasks):
+    task_id = test_tasks[0].id
+    authorized_client.post(
+        "/todos", json={"title": "new task", "description": "new description"})
+    authorized_client.delete(f"/todos/{task_id}")
+
+    res = authorized_client.get("/todos")
+    assert res.json()['total'] == len(test_tasks)
+
+
+def test_get_tasks_search_count_is_bounded(authorized_client, test_tasks, monkeypatch):
+    res = authorized_client.get("/todos?search=first")
+    assert res.json()['total'] == 2
+    assert res.json()['total_exact'] is True
+
+    monkeypatch.setattr(settings, "search_count_limit", 2)
+    res = authorized_client.get("/todos?search=task")
+    assert res.json()['total'] == 2
+    assert res.json()['total_exact'] is False
+
+
+def test_search_tasks_by_title_and_description(authorized_client, test_tasks):
+    res = authorized_client.get("/todos?search=fir")
+    titles = [task['title'] for task in res.json()['data']]
+    assert res.status_code == 200
+    assert titles == ["first task", "fourth task"]
+
+    res = authorized_client.get("/todos?search=second description")
+    titles = [task['title'] for task in res.json()['data']]
+    assert titles == ["second task"]
+
+
 def test_unauthorized_user_get_all_tasks(client, test_tasks):
     res = client.get("/todos")
     assert res.status_code == 401
@@ -109,4 +226,404 @@ def test_update_task_non_exist(authorized_client, test_user, test_tasks):
     res = authorized_client.put(
         f"/todos/8000000", json=data)
 
-    assert res.status_code == 404
\ No newline at end of file
+    assert res.status_code == 404
+
+def test_create_tasks_bulk(authorized_client, test_tasks):
+    tasks = [{"title": f"bulk task {i}", "description": "bulk"} for i in range(3)]
+    res = authorized_client.post("/todos/bulk", json=tasks)
+    results = res.json()['results']
+
+    assert res.status_code == 201
+    assert [result['status'] for result in results] == [201, 201, 201]
+    assert [result['data']['title'] for result in results] == [task['title'] for task in tasks]
+    assert authorized_client.get("/todos").json()['total'] == len(test_tasks) + 3
+
+
+def test_create_tasks_bulk_validates_every_item(authorized_client, test_tasks):
+    tasks = [{"title": "ok", "description": "ok"}, {"title": "x" * 31, "description": "too long"}]
+    res = authorized_client.post("/todos/bulk", json=tasks)
+    assert res.status_code == 422
+
+
+def test_create_tasks_bulk_limit(authorized_client, test_tasks):
+    tasks = [{"title": "t", "description": "d"}] * (settings.bulk_max_items + 1)
+    res = authorized_client.post("/todos/bulk", json=tasks)
+    assert res.status_code == 422
+
+
+def test_update_tasks_bulk(authorized_client, test_tasks, test_tasks2):
+    own_id, other_id = test_tasks[0].id, test_tasks2[0].id
+    res = authorized_client.patch("/todos/bulk", json=[
+        {"id": own_id, "title": "updated title", "description": "updated"},
+        {"id": other_id, "title": "hijacked", "description": "hijacked"},
+        {"id": 8000000, "title": "missing", "description": "missing"},
+    ])
+    results = res.json()['results']
+
+    assert res.status_code == 200
+    assert [result['status'] for result in results] == [200, 403, 404]
+    assert results[0]['data']['title'] == "updated title"
+
+
+def test_update_tasks_bulk_on_sqlite(client, monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        with Session(engine) as db:
+            yield db
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+    user = create_test_user(client, {"name": "sqlite", "email": "sqlite@gmail.com",
+                                     "password": "password123"})
+    client.headers["Authorization"] = f"Bearer {user['access_token']}"
+    first, second = (client.post("/todos", json={"title": title, "description": "d"}).json()
+                     for title in ("first", "second"))
+    res = client.patch("/todos/bulk", json=[
+        {"id": second["id"], "title": "second updated", "description": "updated"},
+        {"id": first["id"], "title": "first updated", "description": "updated"},
+        {"id": 8000000, "title": "missing", "description": "missing"},
+    ])
+    results = res.json()['results']
+
+    assert res.status_code == 200
+    assert [result['status'] for result in results] == [200, 200, 404]
+    assert [result['data']['title'] for result in results[:2]] == \
+        ["second updated", "first updated"]
+    engine.dispose()
+
+
+def test_delete_tasks_bulk(authorized_client, test_tasks, test_tasks2):
+    ids = [test_tasks[0].id, test_tasks[1].id, test_tasks2[0].id, 8000000]
+    res = authorized_client.request("DELETE", "/todos/bulk", json=ids)
+    results = res.json()['results']
+
+    assert res.status_code == 200
+    assert [result['status'] for result in results] == [204, 204, 403, 404]
+    assert authorized_client.get("/todos").json()['total'] == len(test_tasks) - 2
+
+
+def test_delete_tasks_bulk_rejects_duplicates(authorized_client, test_tasks):
+    task_id = test_tasks[0].id
+    res = authorized_client.request("DELETE", "/todos/bulk", json=[task_id, task_id])
+    assert res.status_code == 422
+
+
+def task_statements(statements):
+    return [s for s in statements if "users.email" not in s]
+
+
+def test_update_task_is_one_write(authorized_client, test_tasks, statements):
+    task_id = test_tasks[0].id
+    statements.clear()
+    res = authorized_client.put(
+        f"/todos/{task_id}", json={"title": "updated", "description": "updated"})
+
+    assert res.status_code == 200
+    writes = task_statements(statements)
+    assert len(writes) == 2
+    assert writes[0].endswith("FOR UPDATE")
+    assert writes[1].startswith("UPDATE tasks")
+
+
+def test_delete_task_round_trips(authorized_client, test_tasks, statements):
+    task_id = test_tasks[0].id
+    statements.clear()
+    res = authorized_client.delete(f"/todos/{task_id}")
+
+    assert res.status_code == 204
+    writes = task_statements(statements)
+    assert len(writes) == 3
+    assert writes[0].endswith("FOR UPDATE")
+    assert writes[1].startswith("UPDATE tasks")
+    assert writes[2].startswith("UPDATE users")
+
+
+def test_get_tasks_served_from_cache(authorized_client, test_tasks, statements):
+    first = authorized_client.get("/todos?limit=2")
+    statements.clear()
+    second = authorized_client.get("/todos?limit=2")
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert not [s for s in statements if "FROM tasks" in s]
+    assert task_list_cache.stats()['hits'] == 1
+
+
+def test_task_writes_invalidate_cached_lists(authorized_client, test_tasks):
+    assert authorized_client.get("/todos").json()['total'] == len(test_tasks)
+
+    authorized_client.post("/todos", json={"title": "new", "description": "new"})
+    res = authorized_client.get("/todos")
+    assert res.json()['total'] == len(test_tasks) + 1
+    assert res.json()['data'][0]['title'] == "new"
+
+
+def test_cached_lists_shared_through_redis(authorized_client, test_tasks, fake_redis):
+    authorized_client.get("/todos")
+    task_list_cache.local.clear()
+
+    authorized_client.get("/todos")
+    assert task_list_cache.stats()['hits'] == 1
+
+    authorized_client.put(f"/todos/{test_tasks[0].id}",
+                          json={"title": "changed", "description": "changed"})
+    res = authorized_client.get("/todos")
+    assert "changed" in [task['title'] for task in res.json()['data']]
+    assert task_list_cache.stats()['misses'] == 2
+
+
+def test_failed_bumps_are_retried(authorized_client, test_tasks, fake_redis):
+    authorized_client.get("/todos")
+    user_id = test_tasks[0].owner_id
+    assert asyncio.run(fake_redis.ttl(f"todos:{user_id}:version")) > 0
+
+    fake_redis.fail = True
+    authorized_client.put(f"/todos/{test_tasks[0].id}",
+                          json={"title": "changed", "description": "changed"})
+    assert task_list_cache.stats()['unconfirmed_bumps'] == 1
+
+    fake_redis.fail = False
+    redis_breaker.reset()
+    res = authorized_client.get("/todos")
+    assert "changed" in [task['title'] for task in res.json()['data']]
+    assert task_list_cache.stats()['unconfirmed_bumps'] == 0
+
+
+def test_get_tasks_not_modified(authorized_client, test_tasks, statements, fake_redis):
+    first = authorized_client.get("/todos?limit=2")
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == "private, no-cache"
+
+    statements.clear()
+    res = authorized_client.get("/todos?limit=2", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers['ETag'] == etag
+    assert res.content == b""
+    assert len(statements) <= 1
+    assert not [s for s in statements if "FROM tasks" in s]
+
+    other = authorized_client.get("/todos?limit=3", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_task_writes_change_etag(authorized_client, test_tasks, fake_redis):
+    etag = authorized_client.get("/todos").headers['ETag']
+    authorized_client.post("/todos", json={"title": "new", "description": "new"})
+
+    res = authorized_client.get("/todos", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+
+
+def test_no_list_etag_without_redis(authorized_client, test_tasks):
+    # Worker-local versions miss other workers' writes.
+    assert "ETag" not in authorized_client.get("/todos").headers
+
+
+def test_no_list_etag_while_bump_unconfirmed(authorized_client, test_tasks, fake_redis):
+    etag = authorized_client.get("/todos").headers['ETag']
+    fake_redis.fail = True
+    authorized_client.put(f"/todos/{test_tasks[0].id}",
+                          json={"title": "changed", "description": "changed"})
+
+    res = authorized_client.get("/todos", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert "ETag" not in res.headers
+
+
+def test_task_changes_since_token(authorized_client, test_tasks, test_tasks2):
+    own_ids = sorted(task.id for task in test_tasks)
+    res = authorized_client.get("/todos/changes")
+    assert res.status_code == 200
+    first = res.json()
+    assert sorted(task['id'] for task in first['data']) == own_ids
+    assert first['has_more'] is False
+    token = first['next_token']
+
+    unchanged = authorized_client.get(f"/todos/changes?since={token}").json()
+    assert unchanged['data'] == []
+    assert unchanged['next_token'] == token
+
+    updated_id, deleted_id = own_ids[:2]
+    authorized_client.put(f"/todos/{updated_id}",
+                          json={"title": "changed", "description": "changed"})
+    authorized_client.delete(f"/todos/{deleted_id}")
+
+    changes = authorized_client.get(f"/todos/changes?since={token}").json()
+    by_id = {task['id']: task for task in changes['data']}
+    assert set(by_id) == {updated_id, deleted_id}
+    assert by_id[updated_id]['title'] == "changed"
+    assert by_id[updated_id]['deleted_at'] is None
+    assert by_id[deleted_id]['deleted_at'] is not None
+
+
+def test_task_changes_pages_with_has_more(authorized_client, test_tasks):
+    res = authorized_client.get("/todos/changes?limit=3").json()
+    assert len(res['data']) == 3
+    assert res['has_more'] is True
+
+    rest = authorized_client.get(f"/todos/changes?since={res['next_token']}").json()
+    assert len(rest['data']) == len(test_tasks) - 3
+    assert rest['has_more'] is False
+
+
+def test_task_changes_follow_commit_order(empty_database_url):
+    """A write waits for a longer transaction of the same user to commit,
+    so no sync in between can move its token past the longer one's change.
+    """
+    engine = create_engine(empty_database_url)
+    Base.metadata.create_all(engine)
+    tasks = models.Task.__table__
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__).values(
+            id=1, name="sync", email="sync@example.com", password="x"))
+        conn.execute(insert(tasks), [{"title": title, "description": "", "owner_id": 1}
+                                     for title in ("long", "short")])
+
+    def write(conn, title):
+        conn.execute(models.lock_owner(1))
+        conn.execute(update(tasks).where(tasks.c.title == title).values(description="changed"))
+
+    def short_write():
+        with engine.begin() as conn:
+            write(conn, "short")
+
+    def changes():
+        with engine.connect() as conn:
+            return conn.scalars(select(tasks.c.title)
+                                .where(tasks.c.description == "changed")
+                                .order_by(tasks.c.change_seq, tasks.c.id)).all()
+
+    try:
+        with engine.connect() as long:
+            long.begin()
+            write(long, "long")
+            short = threading.Thread(target=short_write)
+            short.start()
+            short.join(0.5)
+            assert short.is_alive()
+            assert changes() == []
+            long.commit()
+        short.join()
+        assert changes() == ["long", "short"]
+    finally:
+        engine.dispose()
+
+
+def test_task_changes_reject_expired_token(authorized_client, test_tasks):
+    token = pagination.encode_change_token(datetime(2000, 1, 1), 1, test_tasks[0].id)
+    res = authorized_client.get(f"/todos/changes?since={token}")
+    assert res.status_code == 410
+
+
+def test_purge_tombstones(authorized_client, test_user, test_tasks, session, monkeypatch):
+    ids = [task.id for task in test_tasks]
+    authorized_client.delete(f"/todos/{ids[0]}")
+    assert tombstones.purge_batch(session.connection()) == 0
+
+    monkeypatch.setattr(settings, "tombstone_retention_days", 0)
+    assert tombstones.purge_batch(session.connection()) == 1
+    remaining = session.scalars(select(models.Task.id).where(models.Task.id.in_(ids))).all()
+    assert sorted(remaining) == sorted(ids[1:])
+
+
+def test_deleted_tasks_are_hidden(authorized_client, test_tasks):
+    task_id = test_tasks[0].id
+    assert authorized_client.delete(f"/todos/{task_id}").status_code == 204
+
+    res = authorized_client.get("/todos").json()
+    assert task_id not in [task['id'] for task in res['data']]
+    assert res['total'] == len(test_tasks) - 1
+    assert authorized_client.delete(f"/todos/{task_id}").status_code == 404
+    res = authorized_client.put(f"/todos/{task_id}", json={"title": "t", "description": "d"})
+    assert res.status_code == 404
+
+
+def test_export_tasks_ndjson(authorized_client, test_tasks, test_tasks2):
+    own_ids = sorted(task.id for task in test_tasks)
+    authorized_client.delete(f"/todos/{own_ids[0]}")
+
+    res = authorized_client.get("/todos/export")
+    assert res.status_code == 200
+    assert res.headers['content-type'] == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [row['id'] for row in rows] == own_ids[1:]
+    schemas.TaskOut(**rows[0])
+
+    listed = authorized_client.get("/todos").json()['data']
+    assert res.content.splitlines() == [orjson.dumps(task) for task in reversed(listed)]
+
+
+def test_export_tasks_csv(authorized_client, test_tasks):
+    res = authorized_client.get("/todos/export?format=csv")
+    assert res.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert len(rows) == len(test_tasks)
+    assert set(rows[0]) == {"id", "title", "description", "created_at"}
+
+
+def test_import_tasks_ndjson(authorized_client, test_user):
+    lines = [
+        json.dumps({"title": "first", "description": "one"}),
+        "",
+        json.dumps({"title": "x" * 31, "description": "too long"}),
+        "{not json",
+        json.dumps({"title": "second", "description": "two", "id": 999}),
+    ]
+
+    def body():
+        for line in lines:
+            yield (line + "\n").encode()
+
+    res = authorized_client.post("/todos/import", content=body())
+    assert res.status_code == 200
+    report = res.json()
+    assert report['imported'] == 2
+    assert report['failed'] == 2
+    assert [error['row'] for error in report['errors']] == [2, 3]
+    assert "title" in report['errors'][0]['errors'][0]
+
+    res = authorized_client.get("/todos").json()
+    assert res['total'] == 2
+    assert {task['title'] for task in res['data']} == {"first", "second"}
+
+
+def test_import_tasks_csv_round_trips_export(authorized_client, test_tasks, monkeypatch):
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    exported = authorized_client.get("/todos/export?format=csv").content
+    exported += b'7,"multi\nline",desc,2024-01-01T00:00:00\n'
+
+    res = authorized_client.post("/todos/import?format=csv", content=exported)
+    assert res.json() == {"imported": len(test_tasks) + 1, "failed": 0,
+                          "errors": [], "errors_truncated": False}
+    assert authorized_client.get("/todos").json()['total'] == 2 * len(test_tasks) + 1
+
+
+def test_failed_import_keeps_committed_batches_visible(authorized_client, test_user,
+                                                       fake_redis, monkeypatch):
+    assert authorized_client.get("/todos").json()['total'] == 0
+    monkeypatch.setattr(settings, "import_batch_size", 1)
+    copy_tasks = importer.copy_tasks
+
+    def fail_after_first_batch(session, owner_id, batch):
+        if batch[0].title == "second":
+            raise RuntimeError("connection lost")
+        copy_tasks(session, owner_id, batch)
+    monkeypatch.setattr(importer, "copy_tasks", fail_after_first_batch)
+
+    body = "\n".join(json.dumps({"title": title, "description": "d"})
+                     for title in ("first", "second"))
+    with pytest.raises(RuntimeError):
+        authorized_client.post("/todos/import", content=body)
+
+    res = authorized_client.get("/todos").json()
+    assert [task['title'] for task in res['data']] == ["first"]
+    assert res['total'] == 1
+
+
+def test_task_page_matches_response_model(authorized_client, test_tasks):
+    res = authorized_client.get("/todos?limit=3")
+    parsed = schemas.TaskResponse.model_validate_json(res.content)
+    assert parsed.model_dump_json().encode() == res.content
@@ -1,6 +1,10 @@
+import asyncio
+import threading
+
 import pytest
 import jwt
-from backend import schemas
+from backend import models, schemas, utils
+from backend.cache import user_cache
 
 from backend.config import settings
 
@@ -38,3 +42,118 @@ def test_incorrect_login(test_user, client, email, password, status_code):
         "/login", data={"username": email, "password": password})
 
     assert res.status_code == status_code
+
+
+def login_token(client, email="luis@gmail.com", password="password123"):
+    res = client.post("/login", data={"username": email, "password": password})
+    return res.json()['access_token']
+
+
+def test_login_token_carries_user_id(test_user, client):
+    payload = jwt.decode(login_token(client),
+                         settings.secret_key, algorithms=[settings.algorithm])
+    assert payload.get("user_id") == test_user['id']
+
+
+def count_user_lookups(statements, client, headers, requests=1):
+    statements.clear()
+    for _ in range(requests):
+        assert client.get("/todos", headers=headers).status_code == 200
+
+    return len([s for s in statements if "users.email" in s])
+
+
+def test_current_user_is_cached(test_user, client, statements):
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert count_user_lookups(statements, client, headers, requests=2) == 1
+
+
+def test_stateless_auth_skips_user_lookup(test_user, client, statements, monkeypatch):
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert count_user_lookups(statements, client, headers) == 0
+
+
+def test_logout_revokes_tokens(test_user, client, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert client.get("/todos", headers=headers).status_code == 200
+
+    assert client.post("/logout", headers=headers).status_code == 204
+    assert client.get("/todos", headers=headers).status_code == 401
+
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert client.get("/todos", headers=headers).status_code == 200
+
+
+def test_logout_without_redis(test_user, client):
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert client.post("/logout", headers=headers).status_code == 503
+
+
+def test_user_cache_dropped_on_update(test_user, client, session):
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert client.get("/todos", headers=headers).status_code == 200
+    assert user_cache.local.get(test_user['id']) is not None
+
+    user = session.get(models.User, test_user['id'])
+    user.email = "changed@gmail.com"
+    session.commit()
+
+    assert user_cache.local.get(test_user['id']) is None
+    assert client.get("/todos", headers=headers).status_code == 401
+
+
+def test_user_changes_drop_shared_cache_entries(test_user, client, session, fake_redis):
+    headers = {"Authorization": f"Bearer {login_token(client)}"}
+    assert client.get("/todos", headers=headers).status_code == 200
+    key = f"user:{test_user['id']}"
+    assert asyncio.run(fake_redis.exists(key))
+
+    user = session.get(models.User, test_user['id'])
+    user.email = "changed@gmail.com"
+    session.commit()
+    assert user_cache.stale == {test_user['id']}
+
+    asyncio.run(user_cache.flush())
+    assert not asyncio.run(fake_redis.exists(key))
+    assert user_cache.stale == set()
+
+
+def test_login_rehashes_outdated_password(test_user, client, session, monkeypatch):
+    # Hash in-process so the patched context applies.
+    monkeypatch.setattr(settings, "password_hash_workers", 0)
+    weaker = utils.pwd_context().copy(bcrypt__rounds=5)
+    monkeypatch.setattr(utils, "pwd_context", lambda: weaker)
+    old_hash = session.get(models.User, test_user['id']).password
+
+    assert client.post("/login", data={
+        "username": "luis@gmail.com", "password": "password123"}).status_code == 200
+
+    session.expire_all()
+    new_hash = session.get(models.User, test_user['id']).password
+    assert new_hash != old_hash
+    assert new_hash.startswith("$2b$05$")
+    assert utils.verify("password123", new_hash)
+
+
+def test_login_rejected_when_hash_pool_is_full(test_user, client, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(utils, "_hash_slots", slots)
+
+    res = client.post("/login", data={
+        "username": "luis@gmail.com", "password": "password123"})
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+
+
+def test_get_user_not_modified(test_user, client, statements):
+    first = client.get(f"/users/{test_user['id']}")
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    statements.clear()
+    res = client.get(f"/users/{test_user['id']}", headers={"If-None-Match": f'W/{etag}'})
+    assert res.status_code == 304
+    assert len(statements) <= 1